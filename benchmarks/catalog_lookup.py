@@ -0,0 +1,66 @@
+"""Time image-date lookups by catalog id on large synthetic events.
+
+Compares the boolean-mask scan that ``get_image_date`` used to run with the
+per-event ``EventData.catalogs`` index.
+
+    python -m benchmarks.catalog_lookup
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.click_lookup import synthetic_footprints
+from solara_maxar import EventData
+
+SIZES = [10_000, 100_000]
+LOOKUPS = 1_000
+
+
+def synthetic_event(n, seed=0):
+    rng = np.random.default_rng(seed)
+    gdf = synthetic_footprints(n, seed)
+    # About 20 footprints per catalog, acquired over one month
+    gdf["catalog_id"] = [f"{i:016X}" for i in rng.integers(0, n // 20, n)]
+    days = rng.integers(0, 30, n)
+    gdf["datetime"] = pd.Timestamp("2023-09-01", tz="UTC") + pd.to_timedelta(
+        days, unit="D"
+    )
+    catalog_ids = sorted(gdf["catalog_id"].unique().tolist())
+    return EventData("synthetic", gdf, catalog_ids)
+
+
+def scan(data, catalog_id):
+    gdf = data.footprint
+    return pd.Timestamp(gdf[gdf["catalog_id"] == catalog_id]["datetime"].values[0])
+
+
+def indexed(data, catalog_id):
+    return data.catalogs[catalog_id].datetime
+
+
+def main():
+    rng = np.random.default_rng(1)
+    for n in SIZES:
+        start = time.perf_counter()
+        data = synthetic_event(n)
+        build = time.perf_counter() - start
+        lookups = rng.choice(data.catalog_ids, LOOKUPS)
+
+        timings = {}
+        for func in [scan, indexed]:
+            start = time.perf_counter()
+            for catalog_id in lookups:
+                func(data, catalog_id)
+            timings[func.__name__] = (time.perf_counter() - start) / LOOKUPS * 1e6
+
+        print(
+            f"{n:>7} footprints, {len(data.catalog_ids):>5} catalogs: "
+            f"scan {timings['scan']:9.1f} us, index {timings['indexed']:6.2f} us "
+            f"(EventData built in {build:.2f} s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
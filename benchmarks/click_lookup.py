@@ -0,0 +1,66 @@
+"""Time click-to-select footprint lookups on synthetic footprint layers.
+
+Compares the full ``gdf.intersects`` scan with a query against the cached
+spatial index, for 1k, 10k and 100k polygons.
+
+    python -m benchmarks.click_lookup
+"""
+
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import Point
+
+from solara_maxar import select_footprints
+
+SIZES = [1_000, 10_000, 100_000]
+CLICKS = 200
+
+
+def synthetic_footprints(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-180, 179, n)
+    y = rng.uniform(-85, 84, n)
+    size = rng.uniform(0.05, 1.0, n)
+    geometry = shapely.box(x, y, x + size, y + size)
+    return gpd.GeoDataFrame(
+        {"catalog_id": [f"{i:016X}" for i in range(n)]},
+        geometry=geometry,
+        crs="EPSG:4326",
+    )
+
+
+def scan(gdf, geometry):
+    return gdf[gdf.intersects(geometry)]
+
+
+def main():
+    rng = np.random.default_rng(1)
+    for n in SIZES:
+        gdf = synthetic_footprints(n)
+        points = [
+            Point(x, y) for x, y in rng.uniform((-180, -85), (180, 85), (CLICKS, 2))
+        ]
+
+        start = time.perf_counter()
+        gdf.sindex
+        build = time.perf_counter() - start
+
+        timings = {}
+        for name, func in [("scan", scan), ("sindex", select_footprints)]:
+            start = time.perf_counter()
+            for point in points:
+                func(gdf, point)
+            timings[name] = (time.perf_counter() - start) / CLICKS * 1000
+
+        print(
+            f"{n:>7} polygons: scan {timings['scan']:8.3f} ms/click, "
+            f"sindex {timings['sindex']:8.3f} ms/click "
+            f"(index build {build * 1000:.1f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare footprint loading with one and two parses of the union GeoJSON.
+
+"before" adds the layer from the file with ``add_geojson`` and then reads the
+same file again with ``gpd.read_file``, as the pages used to. "after" runs
+the package's load path on the downloaded file: it reads it once into an
+``EventData`` and builds the layer with ``add_footprint_layer``.
+
+    python -m benchmarks.footprint_load
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+import geopandas as gpd
+import leafmap
+
+from benchmarks.click_lookup import synthetic_footprints
+from solara_maxar import EventData
+from solara_maxar.data import read_footprints
+from solara_maxar.map import add_footprint_layer
+
+SIZES = [10_000, 50_000]
+
+
+def before(path):
+    m = leafmap.Map()
+    m.add_geojson(path, layer_name="Footprint", info_mode="on_hover")
+    return gpd.read_file(path)
+
+
+def after(path):
+    m = leafmap.Map()
+    gdf = read_footprints(path)
+    catalog_ids = sorted(gdf["catalog_id"].unique().tolist())
+    data = EventData("synthetic", gdf, catalog_ids)
+    add_footprint_layer(m, data)
+    return data
+
+
+def measure(func, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tempdir:
+        for n in SIZES:
+            gdf = synthetic_footprints(n)
+            gdf["datetime"] = "2023-09-10T11:08:47Z"
+            path = os.path.join(tempdir, f"synthetic_{n}_union.geojson")
+            gdf.to_file(path, driver="GeoJSON")
+            size = os.path.getsize(path) / 1024**2
+
+            for func in [before, after]:
+                elapsed, peak = measure(func, path)
+                print(
+                    f"{n:>6} polygons ({size:5.1f} MB) {func.__name__:>6}: "
+                    f"{elapsed:6.2f} s, peak {peak:7.1f} MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
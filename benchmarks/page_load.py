@@ -0,0 +1,403 @@
+"""Time page loads and map interactions offline, against synthetic events.
+
+Builds the ``Map`` of each ``pages/0X_*.py`` headlessly, with its event
+served by a local HTTP server: synthetic union GeoJSON, TSV and STAC items,
+plus a stand-in for the titiler requests of an image layer. For each
+footprint count it times
+
+- construction of the map until its footprints are shown, with empty caches
+  ("construct_cold") and with the event in memory ("construct_warm"),
+- ``change_image``, ``handle_click`` and ``change_date`` on the loaded map,
+- ``change_dataset`` to the event of the next page, already in memory,
+
+and the peak memory of a cold construction, traced in a separate pass. The
+results are written as JSON with the package versions, so runs before and
+after an upgrade can be compared.
+
+    python -m benchmarks.page_load
+    python -m benchmarks.page_load --sizes 1000 100000 --output leafmap-0.42.json
+"""
+
+import argparse
+import datetime
+import gc
+import glob
+import http.server
+import importlib.util
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from importlib import metadata
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+SIZES = [1_000, 10_000, 50_000]
+REPEAT = 5
+PACKAGES = ["leafmap", "ipyleaflet", "solara", "geopandas", "shapely", "pandas"]
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# [minx, miny, maxx, maxy] per (event, catalog id) of the current fixtures
+catalog_bounds = {}
+
+
+class FixtureHandler(http.server.SimpleHTTPRequestHandler):
+    """Fixture files, STAC items and the titiler requests of image layers."""
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        item = re.fullmatch(r"/datasets/([^/]+)/([^/]+)\.json", parts.path)
+        if parts.path.startswith("/titiler/"):
+            self.send_json(self.titiler(parts.path, parse_qs(parts.query)))
+        elif item:
+            self.send_json(self.stac_item(*item.groups()))
+        else:
+            super().do_GET()
+
+    def stac_item(self, event, catalog_id):
+        return {
+            "type": "Feature",
+            "stac_version": "1.0.0",
+            "id": catalog_id,
+            "bbox": catalog_bounds.get((event, catalog_id), [-180, -85, 180, 85]),
+            "assets": {
+                "visual": {
+                    "href": f"{self.base_url}/cogs/{catalog_id}.tif",
+                    "type": "image/tiff; application=geotiff; profile=cloud-optimized",
+                }
+            },
+        }
+
+    def titiler(self, path, params):
+        if path.endswith("/stac/assets"):
+            return ["visual"]
+        if path.endswith("/stac/statistics"):
+            band = {"min": 0, "max": 255, "percentile_2": 3, "percentile_98": 248}
+            return {"visual": {"b1": band, "b2": band, "b3": band}}
+        if path.endswith("/stac/WebMercatorQuad/tilejson.json"):
+            return {"tiles": [f"{self.base_url}/titiler/tiles/{{z}}/{{x}}/{{y}}.png"]}
+        # /stac/info.geojson
+        item_path = urlsplit(params["url"][0]).path
+        event, catalog_id = item_path.split("/")[-2:]
+        return self.stac_item(event, catalog_id.removesuffix(".json"))
+
+    @property
+    def base_url(self):
+        return f"http://{self.headers['Host']}"
+
+    def send_json(self, value):
+        content = json.dumps(value).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(root):
+    """Serve ``root`` on a free local port and return its URL."""
+
+    def handler(*args, **kwargs):
+        return FixtureHandler(*args, directory=root, **kwargs)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def page_events():
+    """Event of each page, by page file name."""
+    events = {}
+    for path in sorted(glob.glob(os.path.join(repo_dir, "pages", "0[1-9]_*.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(f"pages.{name}", path)
+        page = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(page)
+        events[name] = page.event
+    return events
+
+
+def write_event(root, event, n, seed):
+    from benchmarks.click_lookup import synthetic_footprints
+
+    # About 20 footprints per catalog, acquired over one month, like
+    # benchmarks.catalog_lookup
+    rng = np.random.default_rng(seed)
+    gdf = synthetic_footprints(n, seed)
+    gdf["catalog_id"] = [f"{i:016X}" for i in rng.integers(0, max(n // 20, 1), n)]
+    acquired = pd.Timestamp("2023-09-01", tz="UTC") + pd.to_timedelta(
+        rng.integers(0, 30 * 86400, n), unit="s"
+    )
+    gdf["datetime"] = acquired.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    datasets = os.path.join(root, "datasets")
+    os.makedirs(datasets, exist_ok=True)
+    gdf.to_file(os.path.join(datasets, f"{event}_union.geojson"), driver="GeoJSON")
+    gdf[["catalog_id", "datetime"]].to_csv(
+        os.path.join(datasets, f"{event}.tsv"), sep="\t", index=False
+    )
+    bounds = gdf.geometry.bounds.groupby(gdf["catalog_id"]).agg(
+        {"minx": "min", "miny": "min", "maxx": "max", "maxy": "max"}
+    )
+    for catalog_id, row in bounds.iterrows():
+        catalog_bounds[event, catalog_id] = row.tolist()
+
+
+def write_fixtures(root, events, n):
+    catalog_bounds.clear()
+    for seed, event in enumerate(events):
+        write_event(root, event, n, seed)
+    pd.DataFrame({"dataset": events}).to_csv(
+        os.path.join(root, "datasets.csv"), index=False
+    )
+
+
+def clear_caches():
+    """Empty the shared caches in memory and on disk, as on a fresh start."""
+    from solara_maxar import cache, downloads
+
+    for lru in cache.caches.values():
+        lru.clear()
+    shutil.rmtree(downloads.cache_dir, ignore_errors=True)
+    gc.collect()
+
+
+def wait_for(predicate, timeout=300):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("The map did not finish loading")
+        time.sleep(0.005)
+
+
+def is_loaded(m, event):
+    data = m.event_data
+    return (
+        data is not None
+        and data.name == event
+        and m.find_layer("Footprint") is not None
+    )
+
+
+def find_widget(m, description):
+    widgets = [m.event_controls]
+    while widgets:
+        widget = widgets.pop()
+        if getattr(widget, "description", None) == description:
+            return widget
+        widgets.extend(getattr(widget, "children", ()))
+    raise LookupError(f"No {description!r} widget on the map")
+
+
+def construct(event):
+    from solara_maxar import Map
+
+    start = time.perf_counter()
+    m = Map(event)
+    wait_for(lambda: is_loaded(m, event))
+    return m, time.perf_counter() - start
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def timed_image(m, image, func, *args):
+    """Seconds until the image selected by ``func`` is on the map."""
+    start = time.perf_counter()
+    func(*args)
+    # Layer parameters are resolved on a background thread.
+    wait_for(lambda: image.value is None or image.value in m.get_layer_names())
+    return time.perf_counter() - start
+
+
+def click(m, latlon):
+    # As ipyleaflet dispatches a click message from the browser
+    for callback in m._interaction_callbacks.callbacks:
+        callback(type="click", coordinates=latlon)
+
+
+def measure_interactions(m, other_event, repeat, rng):
+    """Seconds per change_image, handle_click, change_date and change_dataset."""
+    image = find_widget(m, "Image:")
+    date_picker = find_widget(m, "Start date:")
+    dataset = find_widget(m, "Event:")
+    event = dataset.value
+    timings = {}
+
+    # Images far apart in the dropdown, so none was prefetched by the last.
+    options = list(image.options)
+    picks = rng.choice(len(options), min(repeat, len(options)), replace=False)
+    timings["change_image"] = [
+        timed_image(m, image, setattr, image, "value", options[i]) for i in picks
+    ]
+
+    # Clicks at the centre of random footprints, so each selects images.
+    gdf = m.event_data.footprint
+    points = gdf.geometry.iloc[rng.choice(len(gdf), repeat)].centroid
+    timings["handle_click"] = [
+        timed_image(m, image, click, m, [point.y, point.x]) for point in points
+    ]
+
+    dates = m.event_data.datetime.quantile(np.linspace(0.1, 0.9, repeat))
+    timings["change_date"] = [
+        timed(setattr, date_picker, "value", date.date()) for date in dates
+    ]
+
+    # Back and forth between two events, both in memory.
+    timings["change_dataset"] = []
+    for i in range(repeat):
+        name = [other_event, event][i % 2]
+        start = time.perf_counter()
+        dataset.value = name
+        wait_for(lambda: is_loaded(m, name))
+        timings["change_dataset"].append(time.perf_counter() - start)
+    return timings
+
+
+def peak_memory(event):
+    """Peak MB traced while a map of ``event`` loads with empty caches."""
+    tracemalloc.start()
+    m, _ = construct(event)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    m.close()
+    return peak / 1024**2
+
+
+def run_size(root, pages, n, repeat):
+    events = list(pages.values())
+    write_fixtures(root, events, n)
+    rng = np.random.default_rng(n)
+    results = {name: {"page": name, "event": event} for name, event in pages.items()}
+
+    clear_caches()
+    maps = {}
+    for name, event in pages.items():
+        maps[name], seconds = construct(event)
+        results[name]["timings"] = {"construct_cold": [seconds]}
+
+    for i, (name, event) in enumerate(pages.items()):
+        m, seconds = construct(event)
+        timings = results[name]["timings"]
+        timings["construct_warm"] = [seconds]
+        timings.update(
+            measure_interactions(m, events[(i + 1) % len(events)], repeat, rng)
+        )
+        data = maps[name].event_data
+        results[name]["footprints"] = len(data.footprint)
+        results[name]["catalogs"] = len(data.catalog_ids)
+        m.close()
+
+    for m in maps.values():
+        m.close()
+    for name, event in pages.items():
+        clear_caches()
+        results[name]["peak_memory_mb"] = peak_memory(event)
+    return [{"size": n, **result} for result in results.values()]
+
+
+def environment():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=repo_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": versions,
+        # The opt-in modes the maps ran with
+        "config": {k: v for k, v in os.environ.items() if k.startswith("MAXAR_")},
+    }
+
+
+def print_results(results):
+    names = list(results[0]["timings"])
+    print(
+        f"{'size':>7} {'page':<14}" + "".join(f"{k:>16}" for k in names) + "  peak MB"
+    )
+    for result in results:
+        medians = [statistics.median(result["timings"][k]) * 1000 for k in names]
+        print(
+            f"{result['size']:>7} {result['page']:<14}"
+            + "".join(f"{ms:>13.1f} ms" for ms in medians)
+            + f"  {result['peak_memory_mb']:7.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument(
+        "--output",
+        default=os.path.join(
+            repo_dir,
+            "benchmarks",
+            "results",
+            f"page_load-{time.strftime('%Y%m%d-%H%M%S')}.json",
+        ),
+    )
+    args = parser.parse_args()
+    run = environment()  # before the fixture settings below
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "data")
+        os.makedirs(root)
+        # Set before solara_maxar is imported, which reads them once.
+        base_url = serve(root)
+        os.environ["MAXAR_DATA_URL"] = base_url
+        os.environ["TITILER_ENDPOINT"] = f"{base_url}/titiler"
+        os.environ["MAXAR_CACHE_DIR"] = os.path.join(tempdir, "cache")
+
+        pages = page_events()
+        results = []
+        for n in args.sizes:
+            results.extend(run_size(root, pages, n, args.repeat))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "benchmark": "page_load",
+                **run,
+                "repeat": args.repeat,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print_results(results)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
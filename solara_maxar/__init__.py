@@ -0,0 +1,39 @@
+from . import client, metrics
+from .background import debounce, in_current_context, run_in_background
+from .cache import LRUCache, TTLValue
+from .data import (
+    CatalogInfo,
+    EventData,
+    datasets,
+    events,
+    get_catalog_path,
+    get_catalogs,
+    get_datasets,
+    get_event,
+    get_footprint_path,
+    lod_level,
+    lod_levels,
+    repo,
+    url,
+)
+from .downloads import cache_dir, evict, fetch
+from .map import (
+    EventPage,
+    Map,
+    active_image_layers,
+    add_widgets,
+    get_image_date,
+    select_footprints,
+)
+from .mosaics import add_mosaic_layer, build_mosaic, get_mosaic_url
+from .pool import add_map_state, get_map_state, map_states
+from .stac import (
+    StacPrefetcher,
+    add_stac_layer,
+    get_stac_layer,
+    get_stac_url,
+    resolve_stac_layer,
+    stac_layers,
+)
+from .updates import MapUpdates
+from .warmup import warm_up, warmup_timings
@@ -0,0 +1,60 @@
+import functools
+import threading
+
+from solara.server import kernel_context
+
+
+def in_current_context(func):
+    """Wrap ``func`` to run in the caller's Solara kernel context.
+
+    Widget updates made from another thread need the Solara kernel of the
+    session that scheduled them. Outside a Solara server (e.g. in a notebook)
+    ``func`` is returned unchanged.
+    """
+    try:
+        context = kernel_context.get_current_context()
+    except RuntimeError:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with context:
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run ``func`` on a daemon thread and return the thread."""
+    target = in_current_context(func)
+    thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+    thread.start()
+    return thread
+
+
+def debounce(wait):
+    """Delay calls until ``wait`` seconds pass without another call.
+
+    Only the last call of a burst runs, on a timer thread in the context of
+    the session that made it.
+    """
+
+    def decorator(func):
+        timer = None
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal timer
+            with lock:
+                if timer is not None:
+                    timer.cancel()
+                timer = threading.Timer(
+                    wait, in_current_context(func), args=args, kwargs=kwargs
+                )
+                timer.daemon = True
+                timer.start()
+
+        return wrapper
+
+    return decorator
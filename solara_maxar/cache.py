@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Named caches, reported by the metrics endpoint
+caches = {}
+
+
+class LRUCache:
+    """A thread-safe, size-bounded least-recently-used cache.
+
+    Concurrent ``get`` calls for the same missing key share a single call to
+    ``loader``; other keys are loaded in parallel. A ``name`` reports the
+    cache's size, hits and misses in the metrics.
+    """
+
+    def __init__(self, max_bytes, sizeof=lambda value: 1, name=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        if name is not None:
+            caches[name] = self
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def peek(self, key, default=None):
+        """Cached value of ``key`` without loading it, or ``default``."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def get(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1  # loaded by a concurrent call
+                    self._entries.move_to_end(key)
+                    return self._entries[key]
+                self.misses += 1
+            try:
+                value = loader(key)
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._sizes.pop(key)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.nbytes += size
+            self._evict()
+
+    def resize(self, key):
+        """Account for a change in the size of the cached value of ``key``."""
+        with self._lock:
+            if key not in self._entries:
+                return
+            size = self.sizeof(self._entries[key])
+            self.nbytes += size - self._sizes[key]
+            self._sizes[key] = size
+            self._evict()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self.nbytes -= self._sizes.pop(key)
+            return self._entries.pop(key)
+
+    def drop(self, predicate):
+        """Remove the entries whose key matches ``predicate``."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+                self.nbytes -= self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def _evict(self):
+        # The most recently used entry is always kept, even if it alone
+        # exceeds the cap, so a single large event still gets cached.
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            key, _ = self._entries.popitem(last=False)
+            self.nbytes -= self._sizes.pop(key)
+
+
+metrics.describe("maxar_cache_entries", "gauge", "Entries in each cache.")
+metrics.describe(
+    "maxar_cache_size",
+    "gauge",
+    "Size of each cache, in bytes or entries like its limit.",
+)
+metrics.describe("maxar_cache_limit", "gauge", "Size limit of each cache.")
+metrics.describe("maxar_cache_hits_total", "counter", "Cache lookups that hit.")
+metrics.describe("maxar_cache_misses_total", "counter", "Cache lookups that missed.")
+
+
+@metrics.collector
+def collect_caches():
+    for name, cache in list(caches.items()):
+        labels = {"cache": name}
+        yield "maxar_cache_entries", labels, len(cache)
+        yield "maxar_cache_size", labels, cache.nbytes
+        yield "maxar_cache_limit", labels, cache.max_bytes
+        yield "maxar_cache_hits_total", labels, cache.hits
+        yield "maxar_cache_misses_total", labels, cache.misses
+
+
+class TTLValue:
+    """A single value that is reloaded in the background once older than ``ttl``.
+
+    Only the very first ``get`` blocks on ``loader``, and not even that one if
+    ``fallback`` returns a previously saved ``(value, timestamp)`` pair. Until
+    a refresh succeeds, callers keep getting the stale value.
+    """
+
+    def __init__(self, loader, ttl, fallback=None):
+        self.loader = loader
+        self.ttl = ttl
+        self.fallback = fallback
+        self.value = None
+        self.loaded_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.value is None:
+                saved = self.fallback() if self.fallback is not None else None
+                if saved is None:
+                    saved = self.loader(), time.time()
+                self.value, self.loaded_at = saved
+            if not self._refreshing and time.time() - self.loaded_at > self.ttl:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return self.value
+
+    def _refresh(self):
+        try:
+            value = self.loader()
+        except Exception:
+            logger.warning("Background refresh failed, keeping the stale value")
+        else:
+            with self._lock:
+                self.value, self.loaded_at = value, time.time()
+        finally:
+            with self._lock:
+                self._refreshing = False
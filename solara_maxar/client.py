@@ -0,0 +1,131 @@
+"""The HTTP session all remote data goes through.
+
+Connections are pooled and kept alive per host, idempotent requests are
+retried with exponential backoff on connection errors and 429/5xx
+responses, and every request has a timeout. A semaphore bounds the
+requests in flight across all sessions, so a burst of new sessions queues
+here instead of opening hundreds of connections. Counts, errors, retries,
+bytes and seconds are kept per host in ``stats``.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per host, e.g. MAXAR_HTTP_POOL_SIZE=32
+pool_size = int(os.environ.get("MAXAR_HTTP_POOL_SIZE", 16))
+# Requests in flight at once in this process, e.g. MAXAR_HTTP_CONCURRENCY=32
+max_concurrency = int(os.environ.get("MAXAR_HTTP_CONCURRENCY", 16))
+# Retries of a failed request, e.g. MAXAR_HTTP_RETRIES=5
+retries = int(os.environ.get("MAXAR_HTTP_RETRIES", 3))
+# Seconds to connect, and to wait for data, e.g. MAXAR_HTTP_TIMEOUT=120
+timeout = (10, float(os.environ.get("MAXAR_HTTP_TIMEOUT", 60)))
+
+session = requests.Session()
+adapter = HTTPAdapter(
+    pool_connections=pool_size,
+    pool_maxsize=pool_size,
+    max_retries=Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=False,
+    ),
+)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+
+# Per-host totals: requests, errors, retries, bytes and seconds
+stats = {
+    key: Counter() for key in ["requests", "errors", "retries", "bytes", "seconds"]
+}
+_stats_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max_concurrency)
+
+
+@contextmanager
+def request(method, url, **kwargs):
+    """Send a request through the shared session and yield the response.
+
+    The concurrency slot is held until the block exits, so streamed bodies
+    are read within the bound too.
+    """
+    kwargs.setdefault("timeout", timeout)
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    with _slots:
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            _count(host, requests=1, errors=1, seconds=time.perf_counter() - start)
+            raise
+        try:
+            yield response
+        finally:
+            response.close()
+            _record(host, response, time.perf_counter() - start)
+
+
+def get(url, **kwargs):
+    """GET ``url`` with its body read, raising for HTTP errors."""
+    with request("GET", url, **kwargs) as response:
+        response.raise_for_status()
+        response.content
+    return response
+
+
+def get_json(url, **kwargs):
+    return get(url, **kwargs).json()
+
+
+def _record(host, response, seconds):
+    history = getattr(response.raw.retries, "history", ())
+    _count(
+        host,
+        requests=1,
+        errors=int(response.status_code >= 400),
+        retries=len(history),
+        bytes=response.raw.tell(),
+        seconds=seconds,
+    )
+    logger.debug(
+        "%s %s: %d in %.3f s",
+        response.request.method,
+        response.url,
+        response.status_code,
+        seconds,
+    )
+
+
+def _count(host, **values):
+    with _stats_lock:
+        for key, value in values.items():
+            stats[key][host] += value
+
+
+for key in stats:
+    metrics.describe(
+        f"maxar_http_{key}_total", "counter", f"HTTP {key} per host, of all loaders."
+    )
+
+
+@metrics.collector
+def collect_stats():
+    with _stats_lock:
+        values = {key: dict(counter) for key, counter in stats.items()}
+    for key, hosts in values.items():
+        for host, value in hosts.items():
+            yield f"maxar_http_{key}_total", {"host": host}, value
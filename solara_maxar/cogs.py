@@ -0,0 +1,212 @@
+"""Maxar COG tiles rendered in this process, as an alternative to titiler.
+
+Opt in with MAXAR_TILE_SERVER=local (requires rio-tiler, which the
+localtileserver install in the Dockerfile provides). Image layers then
+point at a route of the Solara server, which reads the tile straight from
+the catalog's COG with HTTP range requests. Rendered PNGs are kept in a
+memory LRU cache shared by all sessions and in a size-bounded directory
+shared by the workers of a container, so a tile many users look at is
+rendered once.
+"""
+
+import contextlib
+import logging
+import os
+import threading
+
+from . import client, metrics
+from .cache import LRUCache
+from .data import get_event, is_event
+from .downloads import atomic_write, cache_dir
+from .server import get_root_path, register_route
+
+try:
+    from rio_tiler.errors import TileOutsideBounds
+    from rio_tiler.io import Reader
+except ImportError:
+    Reader = None
+
+logger = logging.getLogger(__name__)
+
+# Rendered tiles in memory, e.g. MAXAR_COG_TILE_CACHE_MB=512
+memory_cache_size = int(os.environ.get("MAXAR_COG_TILE_CACHE_MB", 256)) * 1024**2
+# Rendered tiles on disk, e.g. MAXAR_COG_DISK_CACHE_MB=8192
+disk_cache_size = int(os.environ.get("MAXAR_COG_DISK_CACHE_MB", 2048)) * 1024**2
+tile_dir = os.path.join(cache_dir, "cog-tiles")
+tile_path = "/_maxar/cog"
+tile_size = 256
+# Asset rendered for each catalog, if the item has it
+asset = "visual"
+
+# Empty tiles outside the image count too, so they stay bounded.
+cog_tiles = LRUCache(
+    memory_cache_size, sizeof=lambda content: len(content) + 64, name="cog_tiles"
+)
+cog_urls = LRUCache(4096, name="cog_urls")
+
+_disk_bytes = None
+_disk_lock = threading.Lock()
+
+
+def enabled():
+    return os.environ.get("MAXAR_TILE_SERVER") == "local" and Reader is not None
+
+
+def get_cog_url(item):
+    """URL of the COG to render from a STAC item."""
+    assets = item["assets"]
+    if asset in assets:
+        return assets[asset]["href"]
+    for value in assets.values():
+        if "geotiff" in value.get("type", ""):
+            return value["href"]
+    raise ValueError(f"No GeoTIFF asset in STAC item {item.get('id')}")
+
+
+def resolve_cog_layer(dataset, catalog_id, item_url):
+    """Layer parameters like stac.resolve_stac_layer, for local tiles."""
+    item = client.get_json(item_url)
+    cog_urls.put(item_url, get_cog_url(item))
+    return {
+        "url": item_url,
+        "tile_url": get_tile_url(dataset, catalog_id),
+        "bounds": item.get("bbox"),
+        "band_names": list(item["assets"]),
+        "vmin": None,
+        "vmax": None,
+    }
+
+
+def render_tile(cog_url, z, x, y):
+    """PNG of a tile, or None if the COG does not cover it."""
+    with Reader(cog_url) as src:
+        try:
+            image = src.tile(x, y, z, tilesize=tile_size)
+        except TileOutsideBounds:
+            return None
+    return image.render(img_format="PNG")
+
+
+def get_catalog_cog_url(dataset, catalog_id):
+    from .stac import get_stac_url
+
+    item_url = get_stac_url(dataset, catalog_id)
+    return cog_urls.get(item_url, lambda url: get_cog_url(client.get_json(url)))
+
+
+def get_tile(dataset, catalog_id, z, x, y):
+    """Rendered tile from memory, disk or the COG, in that order."""
+    return cached_tile(
+        (dataset, catalog_id, z, x, y),
+        lambda: render_tile(get_catalog_cog_url(dataset, catalog_id), z, x, y),
+    )
+
+
+def cached_tile(key, render):
+    """Tile ``(dataset, name, z, x, y)`` from the caches, or from ``render``.
+
+    ``render`` returns PNG bytes, or None for a tile without data.
+    """
+    return cog_tiles.get(key, lambda key: _load_tile(key, render))
+
+
+def _load_tile(key, render):
+    dataset, name, z, x, y = key
+    path = os.path.join(tile_dir, dataset, name, str(z), str(x), f"{y}.png")
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+        os.utime(path)  # recency for disk eviction
+        return content
+    except OSError:
+        pass
+
+    content = render() or b""
+    _save_tile(path, content)
+    return content
+
+
+def _save_tile(path, content):
+    global _disk_bytes
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, lambda tmp: _write_file(tmp, content))
+    except OSError as e:
+        logger.warning("Could not cache tile %s: %s", path, e)
+        return
+    with _disk_lock:
+        if _disk_bytes is None:
+            _disk_bytes = sum(size for _, size, _ in _disk_tiles())
+        else:
+            _disk_bytes += len(content)
+        if _disk_bytes > disk_cache_size:
+            _disk_bytes = _evict_disk()
+
+
+def _write_file(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def _disk_tiles():
+    for root, _, names in os.walk(tile_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with contextlib.suppress(OSError):
+                stat = os.stat(path)
+                yield stat.st_mtime, stat.st_size, path
+
+
+def _evict_disk():
+    # Down to 90% of the cap, so eviction does not run on every new tile.
+    tiles = sorted(_disk_tiles())
+    total = sum(size for _, size, _ in tiles)
+    for _, size, path in tiles:
+        if total <= disk_cache_size * 0.9:
+            break
+        with contextlib.suppress(OSError):
+            os.remove(path)
+            total -= size
+    return total
+
+
+def tile_response(content, kind="image"):
+    from starlette.responses import Response
+
+    metrics.inc("maxar_tiles_served_total", kind=kind)
+    metrics.inc("maxar_tile_bytes_total", len(content), kind=kind)
+    if not content:
+        return Response(status_code=204)
+    return Response(
+        content,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
+
+
+def is_catalog(dataset, catalog_id):
+    """Whether ``catalog_id`` is a catalog of the event ``dataset``."""
+    if not is_event(dataset):
+        return False
+    data = get_event(dataset)
+    return catalog_id in data.catalogs or catalog_id in data.catalog_ids
+
+
+def tile_endpoint(request):
+    from starlette.responses import Response
+
+    params = request.path_params
+    dataset, catalog_id = params["dataset"], params["catalog_id"]
+    # Names become upstream URLs and cache paths.
+    if not is_catalog(dataset, catalog_id):
+        return Response(status_code=404)
+    content = get_tile(dataset, catalog_id, params["z"], params["x"], params["y"])
+    return tile_response(content)
+
+
+def get_tile_url(dataset, catalog_id):
+    register_route(
+        f"{tile_path}/{{dataset}}/{{catalog_id}}/{{z:int}}/{{x:int}}/{{y:int}}.png",
+        tile_endpoint,
+    )
+    return f"{get_root_path()}{tile_path}/{dataset}/{catalog_id}/{{z}}/{{x}}/{{y}}.png"
@@ -0,0 +1,347 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from . import client, metrics
+from .cache import LRUCache, TTLValue
+from .downloads import atomic_write, fetch, get_cache_path, revalidate_after
+
+try:
+    from pyarrow import feather
+except ImportError:
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+# Where event data is read from, e.g. MAXAR_DATA_URL=http://localhost:8000 for a mirror
+url = os.environ.get(
+    "MAXAR_DATA_URL",
+    "https://raw.githubusercontent.com/opengeos/maxar-open-data/master",
+)
+repo = "https://github.com/opengeos/maxar-open-data/blob/master/datasets"
+
+# Memory cap for parsed events shared by all sessions, e.g. MAXAR_CACHE_MB=2048
+cache_size = int(os.environ.get("MAXAR_CACHE_MB", 1024)) * 1024**2
+# Seconds before the event list is refreshed, e.g. MAXAR_DATASETS_TTL=600
+datasets_ttl = float(os.environ.get("MAXAR_DATASETS_TTL", 3600))
+# Footprint level of detail below full precision, from coarsest to finest:
+# (highest map zoom, simplify tolerance in degrees, decimals kept)
+lod_levels = [(7, 0.005, 3), (11, 0.0005, 5)]
+
+
+def lod_level(zoom):
+    """Index into EventData.lod_features for a map zoom."""
+    for level, (max_zoom, _, _) in enumerate(lod_levels):
+        if zoom <= max_zoom:
+            return level
+    return len(lod_levels)
+
+
+# Per-catalog entry of EventData.catalogs: acquisition time of the earliest
+# footprint, [minx, miny, maxx, maxy] of all footprints and their positions.
+CatalogInfo = namedtuple("CatalogInfo", ["datetime", "bounds", "rows"])
+
+
+class EventData:
+    """Parsed footprints and catalogs of one event, shared across sessions.
+
+    Footprints are sorted by acquisition time, so the footprints from a
+    start date onwards are the slice ``footprint.iloc[start_index(date):]``.
+    The footprint GeoDataFrame is read-only: filter it into new frames
+    instead of modifying it in place.
+    """
+
+    def __init__(self, name, footprint, catalog_ids):
+        datetime = pd.to_datetime(footprint["datetime"], utc=True)
+        order = np.argsort(datetime.to_numpy(), kind="stable")
+        self.name = name
+        self.footprint = footprint.iloc[order].reset_index(drop=True)
+        self.footprint.sindex  # build the spatial index once per dataset
+        self.catalog_ids = catalog_ids
+        self.datetime = datetime.iloc[order].reset_index(drop=True)
+        self.total_bounds = self.footprint.total_bounds
+        self.catalogs = self._index_catalogs()
+        # GeoJSON features of the sorted footprints, serialized once and
+        # sliced by every session instead of calling to_json per layer.
+        self.features = json.loads(self.footprint.to_json(default=str))["features"]
+        geometry = self.footprint.geometry.to_numpy()
+        # Coarser copies for zoomed-out views, built on first use, followed
+        # by the full features.
+        self.lod_features = [None] * len(lod_levels) + [self.features]
+        # Coordinates per feature of each built level, and the payload
+        # sizes estimated from them by get_feature_sizes
+        self._coordinates = {len(lod_levels): shapely.get_num_coordinates(geometry)}
+        self._feature_sizes = {}
+        # Reentrant: get_feature_sizes builds the level it needs.
+        self._lock = threading.RLock()
+        # Source file version, and when it was last checked upstream; set
+        # by load_event and get_event.
+        self.version = None
+        self.checked_at = time.time()
+        self.nbytes = (
+            _nbytes(self.footprint)
+            + int(self.datetime.memory_usage(deep=True))
+            + _features_nbytes(geometry)
+        )
+
+    def _simplify_features(self, level):
+        _, tolerance, decimals = lod_levels[level]
+        geometry = shapely.simplify(
+            self.footprint.geometry.to_numpy(), tolerance, preserve_topology=True
+        )
+        geometry = shapely.transform(geometry, lambda c: np.round(c, decimals))
+        self._coordinates[level] = shapely.get_num_coordinates(geometry)
+        self._grow(_features_nbytes(geometry))
+        geometry = json.loads(f"[{','.join(shapely.to_geojson(geometry))}]")
+        # Properties are shared with the full features; only geometry differs.
+        return [
+            {**feature, "geometry": geom}
+            for feature, geom in zip(self.features, geometry)
+        ]
+
+    def get_features(self, zoom):
+        """GeoJSON features at the level of detail for a map zoom.
+
+        Building a level takes seconds on large events, so callers holding
+        a map's action should build it beforehand.
+        """
+        level = lod_level(zoom)
+        if self.lod_features[level] is None:
+            with self._lock:
+                if self.lod_features[level] is None:
+                    self.lod_features[level] = self._simplify_features(level)
+        return self.lod_features[level]
+
+    def get_feature_sizes(self, zoom):
+        """Approximate serialized size of each feature of ``get_features(zoom)``.
+
+        Fitted to the coordinate counts from a sample of serialized
+        features, as serializing all of them would take seconds.
+        """
+        level = lod_level(zoom)
+        with self._lock:
+            if level not in self._feature_sizes:
+                features = self.get_features(zoom)
+                sizes = _estimate_sizes(features, self._coordinates[level])
+                self._feature_sizes[level] = sizes
+                self._grow(sizes.nbytes)
+        return self._feature_sizes[level]
+
+    def _grow(self, nbytes):
+        # Levels are built after the event was cached; count them there too.
+        self.nbytes += nbytes
+        events.resize(self.name)
+
+    def _index_catalogs(self):
+        bounds = self.footprint.geometry.bounds.to_numpy()
+        groups = self.footprint.groupby("catalog_id", sort=False).indices
+        return {
+            catalog_id: CatalogInfo(
+                self.datetime.iloc[rows[0]],
+                [*bounds[rows, :2].min(axis=0), *bounds[rows, 2:].max(axis=0)],
+                rows,
+            )
+            for catalog_id, rows in groups.items()
+        }
+
+    def start_index(self, date):
+        """Position of the first footprint acquired on or after ``date``."""
+        return int(self.datetime.searchsorted(pd.Timestamp(date, tz="UTC")))
+
+
+def _estimate_sizes(features, coordinates, sample=200):
+    if not features:
+        return np.zeros(0, dtype=int)
+    rows = np.unique(np.linspace(0, len(features) - 1, sample).astype(int))
+    x = coordinates[rows]
+    y = np.array([len(json.dumps(features[i])) for i in rows])
+    if np.ptp(x) > 0:
+        slope, intercept = np.polyfit(x, y, 1)
+    else:
+        slope, intercept = 0.0, y.mean()
+    return np.maximum(intercept + slope * coordinates, 0).astype(int)
+
+
+def _features_nbytes(geometry):
+    # Rough size of parsed GeoJSON features: Python floats and lists per
+    # coordinate, plus the feature, geometry and property dicts.
+    coords = shapely.get_num_coordinates(geometry).sum()
+    return int(coords * 160 + len(geometry) * 600)
+
+
+def _nbytes(gdf):
+    attributes = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    coords = shapely.get_num_coordinates(gdf.geometry.to_numpy()).sum()
+    return int(attributes.memory_usage(deep=True).sum() + coords * 16)
+
+
+def get_datasets_path():
+    return get_cache_path("datasets.csv")
+
+
+def read_datasets():
+    datasets = f"{url}/datasets.csv"
+    with metrics.timed("maxar_read_seconds", file="datasets"):
+        df = pd.read_csv(io.BytesIO(client.get(datasets).content))
+    atomic_write(get_datasets_path(), lambda path: df.to_csv(path, index=False))
+    return df
+
+
+def read_saved_datasets():
+    path = get_datasets_path()
+    if os.path.exists(path):
+        return pd.read_csv(path), os.path.getmtime(path)
+
+
+datasets = TTLValue(read_datasets, datasets_ttl, fallback=read_saved_datasets)
+
+
+def get_datasets():
+    return datasets.get()
+
+
+def is_event(name):
+    """Whether ``name`` is in the event list, for names from requests."""
+    return bool((get_datasets()["dataset"] == name).any())
+
+
+def get_footprint_path(name):
+    return fetch(f"{url}/datasets/{name}_union.geojson")
+
+
+def get_catalog_path(name):
+    return fetch(f"{url}/datasets/{name}.tsv")
+
+
+def read_converted(path, read_text, read_binary):
+    """Read a downloaded text file through an uncompressed Feather copy.
+
+    The copy is written next to ``path`` on the first read and memory-mapped
+    on later ones. The text file stays the fallback when pyarrow is missing
+    or the copy is older than the download or unreadable.
+    """
+    converted = os.path.splitext(path)[0] + ".feather"
+    if (
+        feather is not None
+        and os.path.exists(converted)
+        and os.path.getmtime(converted) >= os.path.getmtime(path)
+    ):
+        try:
+            return read_binary(converted)
+        except Exception:
+            logger.warning("Ignoring unreadable cache file %s", converted)
+
+    df = read_text(path)
+    if feather is not None:
+        try:
+            atomic_write(
+                converted,
+                lambda path: df.to_feather(path, compression="uncompressed"),
+            )
+        except Exception:
+            logger.warning("Could not write cache file %s", converted)
+    return df
+
+
+def read_footprints(path):
+    with metrics.timed("maxar_read_seconds", file="footprints"):
+        return read_converted(
+            path,
+            gpd.read_file,
+            lambda path: gpd.read_feather(path, memory_map=True),
+        )
+
+
+def read_catalogs(path):
+    with metrics.timed("maxar_read_seconds", file="catalogs"):
+        return read_converted(
+            path,
+            lambda path: pd.read_csv(path, sep="\t"),
+            lambda path: feather.read_table(path, memory_map=True).to_pandas(),
+        )
+
+
+def get_event_paths(name):
+    """Downloaded catalogs and footprints of ``name``, revalidated if old."""
+    return get_catalog_path(name), get_footprint_path(name)
+
+
+def get_file_version(paths):
+    # Downloads are replaced by a rename, so a new mtime means new content.
+    return tuple(os.path.getmtime(path) for path in paths)
+
+
+def load_event(name):
+    with metrics.timed("maxar_event_load_seconds"):
+        paths = get_event_paths(name)
+        catalog_ids = read_catalogs(paths[0])["catalog_id"].unique().tolist()
+        catalog_ids.sort()
+        data = EventData(name, read_footprints(paths[1]), catalog_ids)
+    data.version = get_file_version(paths)
+    return data
+
+
+events = LRUCache(cache_size, sizeof=lambda data: data.nbytes, name="events")
+
+_reload_callbacks = []
+_revalidate_lock = threading.Lock()
+
+
+def on_reload(func):
+    """Register ``func(name)`` to drop data derived from a reloaded event."""
+    _reload_callbacks.append(func)
+    return func
+
+
+def get_event(name):
+    """Parsed data of event ``name``, shared by all sessions.
+
+    Once loaded more than MAXAR_REVALIDATE_SECONDS ago, its files are
+    revalidated on a background thread, and the event is reloaded if they
+    changed upstream. Callers get the loaded data meanwhile.
+    """
+    data = events.get(name, load_event)
+    revalidate_if_due(name, data)
+    return data
+
+
+def revalidate_if_due(name, data):
+    """Start revalidating the loaded ``data`` of ``name`` if it is old.
+
+    Call it wherever loaded event data is handed out.
+    """
+    with _revalidate_lock:
+        due = time.time() - data.checked_at > revalidate_after
+        if due:
+            data.checked_at = time.time()
+    if due:
+        threading.Thread(
+            target=revalidate_event, args=(name, data), daemon=True
+        ).start()
+
+
+def revalidate_event(name, data):
+    """Reload ``name`` if its files changed since ``data`` was loaded."""
+    try:
+        if get_file_version(get_event_paths(name)) == data.version:
+            return
+        events.put(name, load_event(name))
+    except Exception as e:
+        logger.warning("Could not revalidate %s, keeping the loaded data: %s", name, e)
+        return
+    logger.info("Reloaded %s, its files changed upstream", name)
+    for func in _reload_callbacks:
+        func(name)
+
+
+def get_catalogs(name):
+    return get_event(name).catalog_ids
@@ -0,0 +1,204 @@
+"""A size-bounded on-disk cache of downloaded data files.
+
+Files are downloaded to a temporary name and renamed into place, so a
+reader never sees a partial file. Concurrent requests for the same file
+share one download: threads wait on a per-file lock, and processes that
+share the cache directory wait on a lock file where ``fcntl`` exists.
+Cached files are revalidated with ETag / Last-Modified once they are older
+than MAXAR_REVALIDATE_SECONDS and kept as they are if the server is
+unreachable. When the directory outgrows MAXAR_DISK_CACHE_MB, the least
+recently used files are deleted together with files derived from them.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from . import client, metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Shared by all workers of a container, e.g. MAXAR_CACHE_DIR=/data/maxar
+cache_dir = os.environ.get("MAXAR_CACHE_DIR") or os.path.join(
+    tempfile.gettempdir(), "solara-maxar"
+)
+# Disk space for downloads and their converted copies, e.g. MAXAR_DISK_CACHE_MB=8192
+disk_cache_size = int(os.environ.get("MAXAR_DISK_CACHE_MB", 4096)) * 1024**2
+# Seconds before a cached file is checked against the server again
+revalidate_after = float(os.environ.get("MAXAR_REVALIDATE_SECONDS", 3600))
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def get_cache_path(name):
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, name)
+
+
+def fetch(url, name=None):
+    """Path of the cached download of ``url``, downloading it if needed.
+
+    ``name`` is the file name in the cache, by default the last part of the
+    URL. Files derived from a download should share its name up to the
+    extension, so they are evicted together with it.
+    """
+    path = get_cache_path(name or url.rsplit("/", 1)[-1])
+    with metrics.timed("maxar_fetch_seconds"), _lock(path):
+        meta = _read_meta(path)
+        if meta is None or not os.path.exists(path):
+            result = _download(url, path, {})
+        elif time.time() - meta.get("checked", 0) > revalidate_after:
+            try:
+                result = _download(url, path, meta)
+            except requests.RequestException as e:
+                logger.warning("Could not revalidate %s, using cached copy: %s", url, e)
+                result = "stale"
+        else:
+            _touch(path)
+            result = "cached"
+    metrics.inc("maxar_fetch_total", result=result)
+    evict(keep=path)
+    return path
+
+
+def atomic_write(path, write):
+    """Call ``write`` with a temporary path, then move it to ``path``."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def _download(url, path, meta):
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    with client.request("GET", url, headers=headers, stream=True) as r:
+        r.raise_for_status()
+        if r.status_code == 304:
+            _write_meta(path, {**meta, "checked": time.time()})
+            return "revalidated"
+
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(1024**2):
+                    f.write(chunk)
+
+        atomic_write(path, write)
+        _write_meta(
+            path,
+            {
+                "url": url,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "checked": time.time(),
+            },
+        )
+    return "downloaded"
+
+
+def _meta_path(path):
+    return f"{path}.meta"
+
+
+def _read_meta(path):
+    try:
+        with open(_meta_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+
+    atomic_write(_meta_path(path), write)
+
+
+def _touch(path):
+    # Recency lives on the metadata file: touching the download itself
+    # would make its converted copies look out of date.
+    with contextlib.suppress(OSError):
+        os.utime(_meta_path(path))
+
+
+@contextlib.contextmanager
+def _lock(path):
+    with _locks_lock:
+        lock = _locks.setdefault(path, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _entries():
+    """Cached downloads as (last used, size, path, files), oldest first."""
+    names = os.listdir(cache_dir)
+    entries = []
+    for name in names:
+        if not name.endswith(".meta"):
+            continue
+        path = os.path.join(cache_dir, name[: -len(".meta")])
+        stem = os.path.splitext(os.path.basename(path))[0]
+        files = [
+            os.path.join(cache_dir, other)
+            for other in names
+            if other.startswith(stem + ".") and not other.endswith(".lock")
+        ]
+        try:
+            used = os.path.getmtime(_meta_path(path))
+            size = sum(os.path.getsize(file) for file in files)
+        except OSError:
+            continue  # removed meanwhile
+        entries.append((used, size, path, files))
+    entries.sort()
+    return entries
+
+
+def evict(keep=None):
+    """Delete the least recently used downloads beyond the size cap."""
+    entries = _entries()
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, files in entries:
+        if total <= disk_cache_size:
+            break
+        if path == keep:
+            continue
+        with _locks_lock:
+            lock = _locks.get(path)
+        if lock is not None and lock.locked():
+            continue  # being downloaded or revalidated
+        for file in files:
+            with contextlib.suppress(OSError):
+                os.remove(file)
+        total -= size
+        logger.info("Evicted %s from the download cache", path)
@@ -0,0 +1,513 @@
+import logging
+import os
+import weakref
+from collections import OrderedDict
+
+import ipyleaflet
+import leafmap
+import numpy as np
+import solara
+import ipywidgets as widgets
+import pandas as pd
+import shapely
+from shapely.geometry import Point
+
+from . import metrics, mosaics, pool, tiles
+from .background import debounce, run_in_background
+from .data import get_datasets, get_event, lod_level
+from .stac import StacPrefetcher, add_stac_layer, stac_layers
+from .updates import MapUpdates
+
+# How many likely-next images to resolve ahead of a selection
+prefetch_count = 4
+# Footprints are kept for the viewport widened by this fraction on each side
+view_margin = 0.5
+# The kept area is recomputed once the view is narrower than this fraction
+# of it, so zooming in tightens the culling
+min_view_fraction = 0.25
+# Image layers a map keeps before removing the least recently selected one,
+# e.g. MAXAR_MAX_IMAGE_LAYERS=10
+max_image_layers = int(os.environ.get("MAXAR_MAX_IMAGE_LAYERS", 5))
+
+logger = logging.getLogger(__name__)
+
+# Open maps, dropped as their sessions are garbage collected
+maps = weakref.WeakSet()
+
+
+def active_image_layers():
+    """Image layers on all open maps."""
+    return sum(len(m.image_layers) for m in list(maps))
+
+
+metrics.describe("maxar_open_maps", "gauge", "Maps of open sessions.")
+metrics.describe("maxar_image_layers", "gauge", "Image layers on all open maps.")
+
+
+@metrics.collector
+def collect_maps():
+    yield "maxar_open_maps", {}, len(maps)
+    yield "maxar_image_layers", {}, active_image_layers()
+
+
+def use_image_layer(m, name):
+    """Mark the image layer ``name`` as most recently selected.
+
+    Beyond ``max_image_layers``, the least recently selected image layers
+    are removed, so they stop fetching tiles and holding browser memory.
+    """
+    if m.find_layer(name) is None:
+        return
+    m.image_layers[name] = None
+    m.image_layers.move_to_end(name)
+    while len(m.image_layers) > max_image_layers:
+        oldest, _ = m.image_layers.popitem(last=False)
+        layer = m.find_layer(oldest)
+        if layer is not None:
+            m.remove_layer(layer)
+        getattr(m, "cog_layer_dict", {}).pop(oldest, None)
+    logger.debug(
+        "%d image layers on this map, %d on all maps",
+        len(m.image_layers),
+        active_image_layers(),
+    )
+
+
+def select_footprints(gdf, geometry, start=0):
+    # Query the cached spatial index instead of scanning every polygon,
+    # keeping the row order so catalog_ids[0] is the earliest image.
+    # Rows before ``start`` are filtered out by the date picker.
+    index = gdf.sindex.query(geometry, predicate="intersects")
+    return gdf.iloc[np.sort(index[index >= start])]
+
+
+def add_footprint_layer(m, data):
+    if tiles.enabled():
+        return tiles.add_footprint_tile_layer(m, data.name)
+
+    # leafmap.add_geojson round-trips any input through a GeoDataFrame, so
+    # let it set up the style and hover info from a single feature, then
+    # hand the layer the features that were serialized once per event.
+    m.add_geojson(
+        {"type": "FeatureCollection", "features": data.features[:1]},
+        layer_name="Footprint",
+        zoom_to_layer=False,
+        info_mode="on_hover",
+    )
+    layer = m.find_layer("Footprint")
+    filter_footprint_layer(layer, data, 0, m.zoom)
+    return layer
+
+
+def filter_footprint_layer(layer, data, start, zoom, area=None):
+    # Footprints are sorted by date, so a start date is a slice of them.
+    # GeoJSON layers get geometry simplified for the zoom and, given an
+    # area, only the footprints intersecting it; vector tiles are culled
+    # and simplified per tile by the tile server.
+    if isinstance(layer, ipyleaflet.VectorTileLayer):
+        layer.url = tiles.get_tile_url(data.name, start)
+        return
+    features = data.get_features(zoom)
+    sizes = data.get_feature_sizes(zoom)
+    if area is None:
+        features = features[start:]
+        nbytes = sizes[start:].sum()
+    else:
+        index = data.footprint.sindex.query(area)
+        index = np.sort(index[index >= start])
+        features = [features[i] for i in index]
+        nbytes = sizes[index].sum()
+    layer.data = {"type": "FeatureCollection", "features": features}
+    metrics.observe("maxar_footprint_payload_bytes", int(nbytes))
+
+
+def get_view_area(bounds, area, total_bounds):
+    """Area to keep footprints for, given the map bounds.
+
+    Returns ``area`` unchanged while it still covers the view and the view
+    is not much smaller than it, and None when the widened view covers
+    every footprint.
+    """
+    if not bounds:
+        return area
+    (south, west), (north, east) = bounds
+    if area is not None and area.contains(shapely.box(west, south, east, north)):
+        minx, _, maxx, _ = area.bounds
+        if east - west >= (maxx - minx) * min_view_fraction:
+            return area
+    dx, dy = (east - west) * view_margin, (north - south) * view_margin
+    view = shapely.box(west - dx, south - dy, east + dx, north + dy)
+    if view.contains(shapely.box(*total_bounds)):
+        return None
+    return view
+
+
+def get_image_date(catalog_id, m):
+    image_date = m.event_data.catalogs[catalog_id].datetime
+    return image_date.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def add_widgets(m, event):
+    datasets = get_datasets()["dataset"].tolist()
+    setattr(m, "zoom_to_layer", True)
+    style = {"description_width": "initial"}
+    padding = "0px 0px 0px 5px"
+    dataset = widgets.Dropdown(
+        options=datasets,
+        description="Event:",
+        value=event,
+        style=style,
+        layout=widgets.Layout(width="270px", padding=padding),
+    )
+
+    # Footprints and catalogs are filled in by load_dataset once loaded.
+    setattr(m, "event_data", None)
+    setattr(m, "gdf", None)
+    setattr(m, "footprint", None)
+    setattr(m, "catalog_ids", [])
+    setattr(m, "start_index", 0)
+    setattr(m, "footprint_view", (None, None))
+    setattr(m, "stac_prefetcher", StacPrefetcher())
+    # Image layer names, least recently selected first
+    setattr(m, "image_layers", OrderedDict())
+    maps.add(m)
+    metrics.register_route()
+    # Observers run as actions whose layer updates are applied once, after
+    # every trait change they cascade into, and synced in one message.
+    setattr(m, "updates", MapUpdates(m))
+    updates = m.updates
+
+    date_picker = widgets.DatePicker(
+        description="Start date:",
+        value=pd.to_datetime("2021-01-01").date(),
+        style=style,
+        layout=widgets.Layout(width="270px", padding=padding),
+    )
+
+    image = widgets.Dropdown(
+        value=None,
+        options=m.catalog_ids,
+        description="Image:",
+        style=style,
+        layout=widgets.Layout(width="270px", padding=padding),
+    )
+
+    checkbox = widgets.Checkbox(
+        value=True,
+        description="Footprints",
+        style=style,
+        layout=widgets.Layout(width="90px", padding="0px"),
+    )
+
+    split = widgets.Checkbox(
+        value=False,
+        description="Split map",
+        style=style,
+        layout=widgets.Layout(width="92px", padding=padding),
+    )
+
+    reset = widgets.Checkbox(
+        value=False,
+        description="Reset",
+        style=style,
+        layout=widgets.Layout(width="75px", padding="0px"),
+    )
+
+    output = widgets.Output()
+
+    def refresh_footprints():
+        layer = m.find_layer("Footprint")
+        if layer is None or m.event_data is None:
+            return
+        area = m.footprint_view[1]
+        filter_footprint_layer(layer, m.event_data, m.start_index, m.zoom, area)
+
+    def show_footprints(start):
+        # Update the existing layer instead of removing and rebuilding it.
+        # ipyleaflet syncs GeoJSON data as a whole, so nothing is sent when
+        # the date change leaves the set unchanged.
+        if start == m.start_index:
+            return
+        setattr(m, "start_index", start)
+        setattr(m, "gdf", m.footprint.iloc[start:])
+        updates.schedule("footprint", refresh_footprints)
+
+    @updates.handler("reset")
+    def reset_map(change):
+        if change.new and m.footprint is not None:
+            image.value = None
+            image.options = m.catalog_ids
+            m.layers = m.layers[:3]
+            m.image_layers.clear()
+            m.zoom_to_layer = True
+            reset.value = False
+            date_picker.value = pd.to_datetime("2021-01-01").date()
+            show_footprints(0)
+            satellite_layer = m.find_layer("Google Satellite")
+            satellite_layer.visible = False
+            output.outputs = ()
+
+    reset.observe(reset_map, names="value")
+
+    def prepare_footprints(data, zoom):
+        # Build the detail level for the zoom outside any action: it takes
+        # seconds on large events, and actions hold the map's lock.
+        if not tiles.enabled():
+            data.get_feature_sizes(zoom)
+
+    def show_dataset(data):
+        updates.schedule("footprint", lambda: add_footprint_layer(m, data))
+        center, zoom = tiles.get_fit_view(data.total_bounds)
+        m.center = center
+        m.zoom = zoom
+        setattr(m, "event_data", data)
+        setattr(m, "gdf", data.footprint)
+        setattr(m, "footprint", data.footprint)
+        setattr(m, "catalog_ids", data.catalog_ids)
+        setattr(m, "start_index", 0)
+        setattr(m, "footprint_view", (lod_level(m.zoom), None))
+        image.options = data.catalog_ids
+
+    def load_dataset(name):
+        output.outputs = ()
+        output.append_stdout("Loading footprints...\n")
+        # Downloaded and parsed outside any action, so observers on the
+        # kernel thread keep running meanwhile.
+        try:
+            data = get_event(name)
+        except Exception as e:
+            output.outputs = ()
+            output.append_stdout(f"Failed to load {name}: {e}\n")
+            return
+        prepare_footprints(data, tiles.get_fit_view(data.total_bounds)[1])
+        with updates.action("load"):
+            if dataset.value != name:
+                return  # the user switched to another event meanwhile
+            show_dataset(data)
+            pool.add_map_state(name)
+        output.outputs = ()
+
+    @updates.handler("dataset")
+    def change_dataset(change):
+        m.layers = m.layers[:2]
+        m.image_layers.clear()
+        setattr(m, "event_data", None)
+        setattr(m, "gdf", None)
+        setattr(m, "footprint", None)
+        image.value = None
+        image.options = []
+        run_in_background(load_dataset, change.new)
+
+    dataset.observe(change_dataset, names="value")
+
+    @updates.handler("date")
+    def change_date(change):
+        if change.new and m.event_data is not None:
+            # Always filter the full event, so an earlier date brings
+            # footprints back.
+            start = m.event_data.start_index(change.new)
+            sub_catalog_ids = m.footprint["catalog_id"].values[start:].tolist()
+            image.options = sub_catalog_ids
+            show_footprints(start)
+
+    date_picker.observe(change_date, names="value")
+
+    @debounce(0.3)
+    def change_bounds(change):
+        if m.event_data is not None:
+            prepare_footprints(m.event_data, m.zoom)
+        update_footprint_view(change)
+
+    @updates.handler("bounds")
+    def update_footprint_view(change):
+        # Keep only the footprints around the viewport, at the detail level
+        # of the zoom, and leave the layer alone while neither changes.
+        layer = m.find_layer("Footprint")
+        if layer is None or m.event_data is None:
+            return
+        if isinstance(layer, ipyleaflet.VectorTileLayer):
+            return
+        # A new detail level starts from the view, not the old area.
+        level, area = m.footprint_view
+        if level != lod_level(m.zoom):
+            area = None
+        area = get_view_area(m.bounds, area, m.event_data.total_bounds)
+        view = (lod_level(m.zoom), area)
+        if view == m.footprint_view:
+            return
+        setattr(m, "footprint_view", view)
+        updates.schedule("footprint", refresh_footprints)
+
+    m.observe(change_bounds, names="bounds")
+
+    def prefetch(catalog_ids):
+        catalog_ids = [c for c in dict.fromkeys(catalog_ids) if c != image.value]
+        m.stac_prefetcher.prefetch(dataset.value, catalog_ids[:prefetch_count])
+
+    def resolve_image(name, catalog_id):
+        # Titiler or STAC requests, outside any action; the layer is added
+        # by another pass if the image is still selected then.
+        try:
+            with metrics.timed("maxar_image_layer_seconds"):
+                params = m.stac_prefetcher.get(name, catalog_id)
+        except Exception as e:
+            output.outputs = ()
+            output.append_stdout(f"Failed to load image {catalog_id}: {e}\n")
+            return
+        with updates.action("image"):
+            if (dataset.value, image.value) == (name, catalog_id):
+                updates.schedule("image", lambda: show_image(params))
+
+    def show_image(params=None):
+        # Runs once per action, for the image selected when it ends.
+        if image.value is None:
+            return
+        if image.value not in m.get_layer_names():
+            key = (dataset.value, image.value)
+            if params is None:
+                if key not in stac_layers:
+                    run_in_background(resolve_image, *key)
+                    return
+                params = stac_layers.peek(key)
+            add_stac_layer(m, params, name=image.value, fit_bounds=m.zoom_to_layer)
+            image_date = get_image_date(image.value, m)
+            output.outputs = ()
+            output.append_stdout(f"Image date: {image_date}\n")
+        use_image_layer(m, image.value)
+
+        # Warm the images next to this one in the dropdown.
+        options = list(image.options)
+        if image.value in options:
+            i = options.index(image.value)
+            prefetch(options[i + 1 : i + 3] + options[max(i - 1, 0) : i])
+
+    @updates.handler("image")
+    def change_image(change):
+        if change.new:
+            updates.schedule("image", show_image)
+
+    image.observe(change_image, names="value")
+
+    def change_footprint(change):
+        geojson_layer = m.find_layer("Footprint")
+        if geojson_layer is None:
+            return
+        if change.new:
+            geojson_layer.visible = True
+        else:
+            geojson_layer.visible = False
+
+    checkbox.observe(change_footprint, names="value")
+
+    def change_split(change):
+        if change.new:
+            if image.value is not None:
+                left_layer = m.find_layer(image.value)
+                right_layer = m.find_layer("Google Satellite")
+                right_layer.visible = True
+                footprint_layer = m.find_layer("Footprint")
+                if footprint_layer is not None:
+                    footprint_layer.visible = False
+                checkbox.value = False
+                m.split_map(
+                    left_layer=left_layer,
+                    right_layer=right_layer,
+                    add_close_button=True,
+                    left_label=image.value,
+                    right_label="Google Satellite",
+                )
+                split.value = False
+            else:
+                left_layer = None
+
+    split.observe(change_split, names="value")
+
+    def show_mosaic(catalog_ids):
+        catalog_ids = mosaics.add_mosaic_layer(m, m.event_data, catalog_ids)
+        newest = get_image_date(catalog_ids[0], m)
+        oldest = get_image_date(catalog_ids[-1], m)
+        output.outputs = ()
+        output.append_stdout(
+            f"Mosaic of {len(catalog_ids)} images\nfrom {oldest}\nto {newest}\n"
+        )
+
+    @updates.handler("click")
+    def select_at(latlon):
+        geometry = Point(latlon[::-1])
+        with metrics.timed("maxar_click_lookup_seconds"):
+            selected = select_footprints(m.footprint, geometry, m.start_index)
+        setattr(m, "zoom_to_layer", False)
+        if len(selected) > 0:
+            catalog_ids = selected["catalog_id"].values.tolist()
+            image.value = None
+            if len(set(catalog_ids)) > 1 and mosaics.enabled():
+                # One layer for all of them; single images stay selectable.
+                image.options = catalog_ids
+                updates.schedule("mosaic", lambda: show_mosaic(catalog_ids))
+                return
+            if len(catalog_ids) > 1:
+                image.options = catalog_ids
+                prefetch(catalog_ids[1:])
+            image.value = catalog_ids[0]
+        else:
+            image.value = None
+
+    def handle_click(**kwargs):
+        # Mouse moves are interactions too; only clicks are actions.
+        if kwargs.get("type") == "click" and m.gdf is not None:
+            select_at(kwargs.get("coordinates"))
+
+    m.on_interaction(handle_click)
+
+    box = widgets.VBox(
+        [dataset, date_picker, image, widgets.HBox([checkbox, split, reset]), output]
+    )
+    m.add_widget(box, position="topright", add_header=False)
+    # add_widget displays the box inside an Output widget; keep it at hand
+    # for scripts driving the map, such as benchmarks.page_load.
+    setattr(m, "event_controls", box)
+    data = pool.get_map_state(event)
+    if data is None:
+        run_in_background(load_dataset, event)
+    else:
+        prepare_footprints(data, tiles.get_fit_view(data.total_bounds)[1])
+        with updates.action("pool"):
+            show_dataset(data)
+
+
+class Map(leafmap.Map):
+    def __init__(self, event, **kwargs):
+        kwargs["toolbar_control"] = False
+        super().__init__(**kwargs)
+        basemap = {
+            "url": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}",
+            "attribution": "Google",
+            "name": "Google Satellite",
+        }
+        self.add_tile_layer(**basemap, shown=False)
+        self.add_layer_manager(opened=False)
+        # Footprints load in the background so the basemap and controls
+        # render right away.
+        add_widgets(self, event)
+
+
+@solara.component
+def EventPage(event, zoom, center):
+    with solara.Column(style={"min-width": "500px"}):
+        # solara components support reactive variables
+        # solara.SliderInt(label="Zoom level", value=zoom, min=1, max=20)
+        # using 3rd party widget library require wiring up the events manually
+        # using zoom.value and zoom.set
+        Map.element(  # type: ignore
+            event=event,
+            zoom=zoom.value,
+            on_zoom=zoom.set,
+            center=center.value,
+            on_center=center.set,
+            scroll_wheel_zoom=True,
+            toolbar_ctrl=False,
+            data_ctrl=False,
+            height="780px",
+        )
+        solara.Text(f"Center: {center.value}")
+        solara.Text(f"Zoom: {zoom.value}")
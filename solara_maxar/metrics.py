@@ -0,0 +1,115 @@
+"""Process-wide counters and timings, served in the Prometheus text format.
+
+Hot paths call ``inc``, ``observe`` or ``timed``; caches and other state are
+read by collectors when the metrics are rendered. ``register_route`` serves
+them at /_maxar/metrics on the Solara server.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from . import server
+
+metrics_path = "/_maxar/metrics"
+
+_values = {}
+_types = {}
+_help = {}
+_collectors = []
+_lock = threading.Lock()
+
+
+def _key(metric, labels):
+    return metric, tuple(sorted(labels.items()))
+
+
+def describe(metric, kind, text):
+    _types[metric] = kind
+    _help[metric] = text
+
+
+def inc(metric, value=1, **labels):
+    """Add ``value`` to the counter ``metric``."""
+    _types.setdefault(metric, "counter")
+    key = _key(metric, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + value
+
+
+def observe(metric, value, **labels):
+    """Record ``value`` in the summary ``metric`` (its sum and count)."""
+    _types.setdefault(metric, "summary")
+    with _lock:
+        for suffix, amount in (("_sum", value), ("_count", 1)):
+            key = _key(metric + suffix, labels)
+            _values[key] = _values.get(key, 0) + amount
+
+
+@contextmanager
+def timed(metric, **labels):
+    """Record the seconds the block takes in the summary ``metric``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - start, **labels)
+
+
+def collector(func):
+    """Register ``func`` to yield ``(metric, labels, value)`` at render time.
+
+    Declare the type of each metric it yields with ``describe``.
+    """
+    _collectors.append(func)
+    return func
+
+
+def samples():
+    with _lock:
+        values = dict(_values)
+    for func in _collectors:
+        for metric, labels, value in func():
+            values[_key(metric, labels)] = value
+    return values
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    by_metric = {}
+    for (name, labels), value in samples().items():
+        metric = name
+        if name not in _types:
+            metric = name.rsplit("_", 1)[0]  # the _sum or _count of a summary
+        by_metric.setdefault(metric, []).append((name, labels, value))
+
+    lines = []
+    for metric in sorted(by_metric):
+        if metric in _help:
+            lines.append(f"# HELP {metric} {_help[metric]}")
+        lines.append(f"# TYPE {metric} {_types.get(metric, 'untyped')}")
+        for name, labels, value in sorted(by_metric[metric]):
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            if label_text:
+                name = f"{name}{{{label_text}}}"
+            lines.append(f"{name} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metrics_endpoint(request):
+    from starlette.responses import PlainTextResponse
+
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+def register_route():
+    server.register_route(metrics_path, metrics_endpoint)
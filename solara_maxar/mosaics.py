@@ -0,0 +1,163 @@
+"""All catalogs under a click as one tile layer, MosaicJSON-style.
+
+Opt in with MAXAR_MOSAIC=1 on top of the local tile mode (MAXAR_TILE_SERVER=
+local). A click over several footprints then adds a single "Mosaic" layer
+instead of the first image: each tile is merged from the COGs of the
+catalogs that cover it, the most recent image on top, and cached like the
+tiles of single images. The browser fetches one tile stream for the view
+instead of one per stacked image layer.
+"""
+
+import hashlib
+import os
+
+from . import cogs
+from .cache import LRUCache
+from .data import get_event, is_event, on_reload
+from .server import get_root_path, register_route
+from .tiles import tile_bounds, to_lonlat
+
+try:
+    from rio_tiler.errors import EmptyMosaicError
+    from rio_tiler.mosaic import mosaic_reader
+except ImportError:
+    mosaic_reader = None
+
+mosaic_path = "/_maxar/mosaic"
+layer_name = "Mosaic"
+
+mosaics = LRUCache(1024, name="mosaics")
+
+
+def enabled():
+    return (
+        os.environ.get("MAXAR_MOSAIC", "0") == "1"
+        and cogs.enabled()
+        and mosaic_reader is not None
+    )
+
+
+def order_catalogs(data, catalog_ids):
+    """Unique ``catalog_ids``, most recent first."""
+    catalog_ids = list(dict.fromkeys(catalog_ids))
+    return sorted(
+        catalog_ids,
+        key=lambda catalog_id: data.catalogs[catalog_id].datetime,
+        reverse=True,
+    )
+
+
+def build_mosaic(data, catalog_ids):
+    """MosaicJSON-style definition of ``catalog_ids``, in the given order.
+
+    Instead of a quadkey index, each asset carries its bounds, which is
+    enough to pick the assets of a tile among the few catalogs of a click.
+    """
+    assets = [
+        {
+            "catalog_id": catalog_id,
+            "datetime": data.catalogs[catalog_id].datetime.isoformat(),
+            "bounds": data.catalogs[catalog_id].bounds,
+        }
+        for catalog_id in catalog_ids
+    ]
+    bounds = [asset["bounds"] for asset in assets]
+    return {
+        "mosaicjson": "0.0.3",
+        "dataset": data.name,
+        "bounds": [
+            min(b[0] for b in bounds),
+            min(b[1] for b in bounds),
+            max(b[2] for b in bounds),
+            max(b[3] for b in bounds),
+        ],
+        "assets": assets,
+    }
+
+
+def get_mosaic(dataset, catalog_ids):
+    return mosaics.get(
+        (dataset, tuple(catalog_ids)),
+        lambda key: build_mosaic(get_event(key[0]), key[1]),
+    )
+
+
+@on_reload
+def drop_mosaics(name):
+    # Catalog bounds and dates come from the footprints.
+    mosaics.drop(lambda key: key[0] == name)
+
+
+def render_mosaic_tile(mosaic, z, x, y):
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    west, south = to_lonlat(minx, miny)
+    east, north = to_lonlat(maxx, maxy)
+    urls = [
+        cogs.get_catalog_cog_url(mosaic["dataset"], asset["catalog_id"])
+        for asset in mosaic["assets"]
+        if asset["bounds"][0] <= east
+        and asset["bounds"][2] >= west
+        and asset["bounds"][1] <= north
+        and asset["bounds"][3] >= south
+    ]
+    if not urls:
+        return None
+    try:
+        image, _ = mosaic_reader(urls, read_tile, x, y, z, tilesize=cogs.tile_size)
+    except EmptyMosaicError:
+        return None
+    return image.render(img_format="PNG")
+
+
+def read_tile(url, x, y, z, **kwargs):
+    with cogs.Reader(url) as src:
+        return src.tile(x, y, z, **kwargs)
+
+
+def get_tile(dataset, catalog_ids, z, x, y):
+    # The catalog list can be long, so its disk cache directory is a hash.
+    name = hashlib.sha1(",".join(catalog_ids).encode()).hexdigest()[:16]
+    return cogs.cached_tile(
+        (dataset, f"mosaic-{name}", z, x, y),
+        lambda: render_mosaic_tile(get_mosaic(dataset, catalog_ids), z, x, y),
+    )
+
+
+def tile_endpoint(request):
+    from starlette.responses import Response
+
+    params = request.path_params
+    dataset = params["dataset"]
+    catalog_ids = params["catalog_ids"].split(",")
+    if not is_event(dataset):
+        return Response(status_code=404)  # names become upstream URLs
+    try:
+        content = get_tile(dataset, catalog_ids, params["z"], params["x"], params["y"])
+    except KeyError:
+        return Response(status_code=404)  # not a catalog of the event
+    return cogs.tile_response(content, kind="mosaic")
+
+
+def get_mosaic_url(dataset, catalog_ids):
+    # The catalogs are part of the URL, so any worker can serve the tiles.
+    register_route(
+        f"{mosaic_path}/{{dataset}}/{{catalog_ids}}/{{z:int}}/{{x:int}}/{{y:int}}.png",
+        tile_endpoint,
+    )
+    catalog_ids = ",".join(catalog_ids)
+    return (
+        f"{get_root_path()}{mosaic_path}/{dataset}/{catalog_ids}/{{z}}/{{x}}/{{y}}.png"
+    )
+
+
+def add_mosaic_layer(m, data, catalog_ids):
+    """Replace the mosaic layer of ``m`` with one of ``catalog_ids``.
+
+    Returns the catalogs in mosaic order.
+    """
+    catalog_ids = order_catalogs(data, catalog_ids)
+    layer = m.find_layer(layer_name)
+    if layer is not None:
+        m.remove_layer(layer)
+    m.add_tile_layer(get_mosaic_url(data.name, catalog_ids), layer_name, attribution="")
+    return catalog_ids
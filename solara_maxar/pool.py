@@ -0,0 +1,39 @@
+"""Recently opened events whose maps new sessions build ready, when in memory.
+
+Opt in with MAXAR_MAP_POOL_SIZE=N to pool the N most recently opened events.
+A session opening a pooled event that the shared event cache still holds
+builds its map with the footprints and image options in place before the
+map is first displayed, instead of loading them on a background thread and
+syncing them to the browser afterwards. The pool only keeps event names:
+the data stays in the shared cache, within MAXAR_CACHE_MB, and an event it
+evicts loads in the background again.
+"""
+
+import os
+
+from .cache import LRUCache
+from .data import events, revalidate_if_due
+
+# Events kept ready for new sessions, e.g. MAXAR_MAP_POOL_SIZE=5
+map_pool_size = int(os.environ.get("MAXAR_MAP_POOL_SIZE", 0))
+
+map_states = LRUCache(map_pool_size, name="map_pool")
+
+
+def enabled():
+    return map_pool_size > 0
+
+
+def get_map_state(event):
+    """EventData of ``event`` if it is pooled and in memory, else None."""
+    if not enabled() or map_states.peek(event) is None:
+        return None
+    data = events.peek(event)
+    if data is not None:
+        revalidate_if_due(event, data)
+    return data
+
+
+def add_map_state(event):
+    if enabled():
+        map_states.put(event, True)
@@ -0,0 +1,24 @@
+"""Extra HTTP routes served by the running Solara server."""
+
+import sys
+
+
+def register_route(path, endpoint):
+    """Serve ``endpoint`` at ``path`` from the Solara app, once per process."""
+    # Outside a Solara server there is nothing to serve from, and importing
+    # the server app would patch the widgets of a notebook.
+    if "solara.server.starlette" not in sys.modules:
+        return
+    from solara.server.starlette import app
+    from starlette.routing import Route
+
+    if any(getattr(route, "path", None) == path for route in app.routes):
+        return
+    # Ahead of Solara's catch-all page routes.
+    app.router.routes.insert(0, Route(path, endpoint))
+
+
+def get_root_path():
+    from solara.server import settings
+
+    return (settings.main.root_path or "").rstrip("/")
@@ -0,0 +1,157 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import client, cogs
+from .cache import LRUCache
+from .data import url
+from .tiles import get_fit_view
+
+# Worker threads shared by all sessions, e.g. MAXAR_PREFETCH_WORKERS=8
+prefetch_workers = int(os.environ.get("MAXAR_PREFETCH_WORKERS", 4))
+executor = ThreadPoolExecutor(prefetch_workers, thread_name_prefix="stac-prefetch")
+# Resolved STAC layers shared by all sessions, e.g. MAXAR_STAC_CACHE_SIZE=4096
+stac_cache_size = int(os.environ.get("MAXAR_STAC_CACHE_SIZE", 1024))
+# Same default as leafmap, e.g. TITILER_ENDPOINT=http://localhost:8000
+titiler_endpoint = os.environ.get("TITILER_ENDPOINT", "https://titiler.opengeos.org")
+
+
+def get_stac_url(dataset, catalog_id):
+    return f"{url}/datasets/{dataset}/{catalog_id}.json"
+
+
+def band_stats(stats):
+    # titiler nests band statistics in assets, in newer versions.
+    for value in stats.values():
+        yield value if "percentile_2" in value else next(iter(value.values()))
+
+
+def resolve_stac_layer(url):
+    """Resolve what leafmap's add_stac_layer needs from titiler for a STAC item.
+
+    Makes the same titiler requests as leafmap's stac_tile, stac_bands and
+    stac_bounds, through the shared HTTP session and without repeating
+    any. Returns None if titiler has no tile URL for the item.
+    """
+    band_names = client.get_json(f"{titiler_endpoint}/stac/assets", params={"url": url})
+    # leafmap's default: the first three assets, or the only one.
+    assets = band_names[:3] if len(band_names) >= 3 else band_names[:1]
+    params = {"url": url, "assets": assets}
+    stats = client.get_json(f"{titiler_endpoint}/stac/statistics", params=params)
+    # titiler reports a timeout as {"detail": ...}; tiles are then unscaled.
+    stats = [] if "detail" in stats else list(band_stats(stats))
+    if stats:
+        low = min(s["percentile_2"] for s in stats)
+        high = max(s["percentile_98"] for s in stats)
+        params["rescale"] = f"{low},{high}"
+    tilejson = client.get_json(
+        f"{titiler_endpoint}/stac/WebMercatorQuad/tilejson.json", params=params
+    )
+    if "tiles" not in tilejson:
+        return None
+    info = client.get_json(f"{titiler_endpoint}/stac/info.geojson", params={"url": url})
+    return {
+        "url": url,
+        "tile_url": tilejson["tiles"][0],
+        "bounds": info.get("bbox"),
+        "band_names": band_names,
+        "vmin": min((s["min"] for s in stats), default=None),
+        "vmax": max((s["max"] for s in stats), default=None),
+    }
+
+
+stac_layers = LRUCache(stac_cache_size, name="stac_layers")
+
+
+def get_stac_layer(dataset, catalog_id):
+    """Resolved STAC layer of a catalog, cached across sessions."""
+    return stac_layers.get((dataset, catalog_id), _resolve)
+
+
+def _resolve(key):
+    if cogs.enabled():
+        return cogs.resolve_cog_layer(*key, get_stac_url(*key))
+    return resolve_stac_layer(get_stac_url(*key))
+
+
+def add_stac_layer(m, params, name, fit_bounds=True):
+    """Add a STAC tile layer from resolved parameters, without network I/O."""
+    if params is None:
+        return
+    m.add_tile_layer(params["tile_url"], name, attribution="")
+    bounds = params["bounds"]
+    if fit_bounds and bounds is not None:
+        center, zoom = get_fit_view(bounds)
+        m.center = center
+        m.zoom = zoom
+
+    # Same entry as leafmap.Map.add_stac_layer, used by the layer manager.
+    if not hasattr(m, "cog_layer_dict"):
+        m.cog_layer_dict = {}
+    m.cog_layer_dict[name] = {
+        "url": params["url"],
+        "titiler_endpoint": None,
+        "collection": None,
+        "item": None,
+        "assets": None,
+        "tile_layer": m.find_layer(name),
+        "indexes": None,
+        "vis_bands": None,
+        "band_names": params["band_names"],
+        "bounds": bounds,
+        "vmin": params["vmin"],
+        "vmax": params["vmax"],
+        "nodata": None,
+        "opacity": 1.0,
+        "layer_name": name,
+        "type": "STAC",
+    }
+
+
+class StacPrefetcher:
+    """Resolves STAC layers of likely-next images in the background.
+
+    Resolutions run on the shared worker pool and land in the shared
+    ``stac_layers`` cache, so switching to a prefetched image only has to
+    add the tile layer. At most ``max_size`` pending prefetches are kept
+    per session; older ones are cancelled.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._futures = OrderedDict()
+        # Reentrant: done callbacks may run immediately, under the lock.
+        self._lock = threading.RLock()
+
+    def prefetch(self, dataset, catalog_ids):
+        for catalog_id in catalog_ids:
+            if (dataset, catalog_id) not in stac_layers:
+                self._submit((dataset, catalog_id))
+
+    def get(self, dataset, catalog_id):
+        key = (dataset, catalog_id)
+        with self._lock:
+            future = self._futures.pop(key, None)
+        # A request still queued behind other prefetches is resolved here
+        # instead, so the image the user asked for never waits on guesses.
+        if future is None or future.cancel():
+            return get_stac_layer(*key)
+        return future.result()
+
+    def _submit(self, key):
+        with self._lock:
+            if key in self._futures:
+                self._futures.move_to_end(key)
+                return
+            future = executor.submit(get_stac_layer, *key)
+            future.add_done_callback(lambda _: self._discard(key, future))
+            self._futures[key] = future
+            while len(self._futures) > self.max_size:
+                _, oldest = self._futures.popitem(last=False)
+                oldest.cancel()
+
+    def _discard(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
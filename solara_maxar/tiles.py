@@ -0,0 +1,183 @@
+"""Mapbox vector tiles of event footprints, served next to the Solara app.
+
+Opt in with MAXAR_FOOTPRINT_TILES=1 (requires mapbox-vector-tile). The
+footprint layer then becomes a VectorTileLayer, and the browser fetches only
+the visible tiles from this process instead of receiving the whole event as
+GeoJSON over the widget connection.
+"""
+
+import math
+import os
+
+import ipyleaflet
+import numpy as np
+import shapely
+
+from . import metrics
+from .cache import LRUCache
+from .data import get_event, is_event, on_reload
+from .server import get_root_path, register_route
+
+try:
+    import mapbox_vector_tile
+except ImportError:
+    mapbox_vector_tile = None
+
+# Encoded tiles shared by all sessions, e.g. MAXAR_TILE_CACHE_MB=256
+tile_cache_size = int(os.environ.get("MAXAR_TILE_CACHE_MB", 64)) * 1024**2
+tile_path = "/_maxar/tiles"
+layer_name = "footprints"
+extent = 4096
+# Highest zoom tiles are served for
+max_tile_zoom = 24
+# Features are clipped slightly outside each tile so edges do not show.
+buffer = 64 / extent
+
+earth_radius = 6378137.0
+max_latitude = 85.0511287798
+
+# Map size in pixels assumed when zooming to bounds: EventPage's height,
+# and about the width of its column
+fit_size = (800, 780)
+
+footprint_tiles = LRUCache(tile_cache_size, sizeof=len, name="footprint_tiles")
+
+
+def enabled():
+    return (
+        os.environ.get("MAXAR_FOOTPRINT_TILES", "0") == "1"
+        and mapbox_vector_tile is not None
+    )
+
+
+def tile_bounds(z, x, y):
+    """Bounds of a tile in Web Mercator meters."""
+    size = 2 * math.pi * earth_radius / 2**z
+    origin = math.pi * earth_radius
+    minx = x * size - origin
+    maxy = origin - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def get_fit_view(bounds, size=fit_size, max_zoom=18):
+    """Center and zoom that show ``bounds`` [minx, miny, maxx, maxy].
+
+    ipyleaflet's fit_bounds needs an asyncio loop and the browser's bounds,
+    which background threads do not have, so compute the view directly.
+    """
+    minx, miny, maxx, maxy = map(float, bounds)
+
+    def mercator_y(lat):
+        lat = math.radians(max(min(lat, max_latitude), -max_latitude))
+        return math.log(math.tan(math.pi / 4 + lat / 2)) / (2 * math.pi)
+
+    # Fraction of the world at zoom 0 spanned by the bounds
+    spans = [(maxx - minx) / 360, mercator_y(maxy) - mercator_y(miny)]
+    zoom = max_zoom
+    for pixels, span in zip(size, spans):
+        if span > 0:
+            zoom = min(zoom, math.floor(math.log2(pixels / 256 / span)))
+    center = ((miny + maxy) / 2, (minx + maxx) / 2)
+    return center, max(zoom, 0)
+
+
+def to_lonlat(x, y):
+    lon = np.degrees(x / earth_radius)
+    lat = np.degrees(2 * np.arctan(np.exp(y / earth_radius)) - np.pi / 2)
+    return lon, lat
+
+
+def to_mercator(coords):
+    lon, lat = coords[:, 0], np.clip(coords[:, 1], -max_latitude, max_latitude)
+    x = earth_radius * np.radians(lon)
+    y = earth_radius * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return np.column_stack([x, y])
+
+
+def render_tile(name, z, x, y, start=0):
+    data = get_event(name)
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    pad = (maxx - minx) * buffer
+    west, south = to_lonlat(minx - pad, miny - pad)
+    east, north = to_lonlat(maxx + pad, maxy + pad)
+
+    # Footprints are sorted by date, so rows before ``start`` are filtered
+    # out by the date picker.
+    index = data.footprint.sindex.query(shapely.box(west, south, east, north))
+    index = np.sort(index[index >= start])
+    geometry = data.footprint.geometry.to_numpy()[index]
+    geometry = shapely.transform(geometry, to_mercator)
+    # Drop detail finer than one tile unit, invisible at this zoom.
+    geometry = shapely.simplify(geometry, (maxx - minx) / extent)
+    geometry = shapely.clip_by_rect(
+        geometry, minx - pad, miny - pad, maxx + pad, maxy + pad
+    )
+    catalog_ids = data.footprint["catalog_id"].values[index]
+    features = [
+        {"geometry": geom, "properties": {"catalog_id": catalog_id}}
+        for geom, catalog_id in zip(geometry, catalog_ids)
+        if not geom.is_empty
+    ]
+    return mapbox_vector_tile.encode(
+        [{"name": layer_name, "features": features}],
+        default_options={"quantize_bounds": (minx, miny, maxx, maxy)},
+    )
+
+
+def get_tile(name, z, x, y, start=0):
+    return footprint_tiles.get((name, z, x, y, start), lambda key: render_tile(*key))
+
+
+@on_reload
+def drop_tiles(name):
+    footprint_tiles.drop(lambda key: key[0] == name)
+
+
+def tile_endpoint(request):
+    from starlette.responses import Response
+
+    params = request.path_params
+    z, x, y = params["z"], params["x"], params["y"]
+    try:
+        start = int(request.query_params.get("start", 0))
+    except ValueError:
+        return Response(status_code=400)
+    # Out-of-range tiles would overflow tile_bounds.
+    if start < 0 or not 0 <= z <= max_tile_zoom:
+        return Response(status_code=400)
+    if not (0 <= x < 2**z and 0 <= y < 2**z):
+        return Response(status_code=400)
+    # Unknown names would be fetched upstream.
+    if not is_event(params["name"]):
+        return Response(status_code=404)
+    content = get_tile(params["name"], z, x, y, start)
+    metrics.inc("maxar_tiles_served_total", kind="footprint")
+    metrics.inc("maxar_tile_bytes_total", len(content), kind="footprint")
+    return Response(content, media_type="application/x-protobuf")
+
+
+def get_tile_url(name, start=0):
+    root_path = get_root_path()
+    return f"{root_path}{tile_path}/{name}/{{z}}/{{x}}/{{y}}.pbf?start={start}"
+
+
+def add_footprint_tile_layer(m, name):
+    register_route(
+        f"{tile_path}/{{name}}/{{z:int}}/{{x:int}}/{{y:int}}.pbf", tile_endpoint
+    )
+    layer = ipyleaflet.VectorTileLayer(
+        url=get_tile_url(name),
+        layer_styles={
+            layer_name: {
+                "color": "#3388ff",
+                "weight": 2,
+                "opacity": 1,
+                "fill": True,
+                "fillColor": "#3388ff",
+                "fillOpacity": 0.2,
+            }
+        },
+        name="Footprint",
+    )
+    m.add(layer)
+    return layer
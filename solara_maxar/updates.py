@@ -0,0 +1,102 @@
+import functools
+import logging
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MapUpdates:
+    """Coalesces the layer updates of one user action into a single pass.
+
+    Widget observers run inside ``action``. Trait changes they make trigger
+    other observers synchronously, inside the same action. Updates scheduled
+    during the action with ``schedule`` replace earlier ones with the same
+    key, and run once when the outermost action ends. Scheduled functions
+    should read the map state when they run, not when they were scheduled.
+
+    Given the map ``widget``, its state is held during each action and sent
+    to the frontend once at the end. An action that removes, adds and
+    filters several layers then syncs only the final layer list, in one
+    message instead of one per change.
+
+    Every update that runs counts as one layer rebuild for the action that
+    started it. ``actions`` and ``rebuilds`` hold the totals per action name.
+    """
+
+    def __init__(self, widget=None):
+        self.widget = widget
+        self.actions = Counter()
+        self.rebuilds = Counter()
+        self.last = None
+        self._pending = OrderedDict()
+        self._depth = 0
+        self._name = None
+        # Reentrant for nested observers, and it keeps the actions of a
+        # background load or a debounce timer from interleaving.
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def action(self, name):
+        """Run the block as the action ``name``.
+
+        An action holds the map's lock and its sync until the outermost one
+        ends, so observers on other threads and trait changes wait for it.
+        Never do blocking work such as network I/O inside one: load first,
+        then apply the result in an action.
+        """
+        with self._lock:
+            outer = self._depth == 0
+            if outer:
+                self._name = name
+            with self.hold_sync() if outer else nullcontext():
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                    if outer:
+                        self._flush()
+
+    def hold_sync(self):
+        if self.widget is None:
+            return nullcontext()
+        return self.widget.hold_sync()
+
+    def handler(self, name):
+        """Decorator running a widget observer as the action ``name``."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.action(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def schedule(self, key, func):
+        with self.action(self._name or key):
+            self._pending.pop(key, None)
+            self._pending[key] = func
+
+    def _flush(self):
+        count = 0
+        try:
+            while self._pending:
+                _, func = self._pending.popitem(last=False)
+                count += 1
+                func()
+        finally:
+            self._pending.clear()
+            self.actions[self._name] += 1
+            self.rebuilds[self._name] += count
+            self.last = (self._name, count)
+            metrics.inc("maxar_actions_total", action=self._name)
+            metrics.inc("maxar_layer_rebuilds_total", count, action=self._name)
+            logger.debug("%s: %d layer rebuild(s)", self._name, count)
+            self._name = None
@@ -0,0 +1,108 @@
+"""Load event data when the server starts, before the first session asks.
+
+Solara imports every page when ``solara run ./pages`` starts, and each page
+calls ``warm_up`` with its event. With MAXAR_WARMUP=pages those events are
+downloaded, parsed and converted on worker threads right away, filling the
+on-disk Feather copies, the shared event cache and the map pool. Set
+MAXAR_WARMUP to a comma-separated list of event names to warm those
+instead.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics, pool
+from .data import get_datasets, get_event
+
+logger = logging.getLogger(__name__)
+
+# "pages", or event names such as MAXAR_WARMUP=Morocco-Earthquake-Sept-2023
+warmup = os.environ.get("MAXAR_WARMUP", "").strip()
+# Parallel loads during warm-up, e.g. MAXAR_WARMUP_WORKERS=2
+warmup_workers = int(os.environ.get("MAXAR_WARMUP_WORKERS", 4))
+
+# Seconds each warmed event took to load, or the exception it failed with
+warmup_timings = {}
+
+_executor = None
+_started = None
+_submitted = set()
+_lock = threading.Lock()
+
+
+def warmup_events():
+    if warmup in ("", "pages"):
+        return []
+    return [name.strip() for name in warmup.split(",") if name.strip()]
+
+
+def warm_up(event):
+    """Warm ``event`` in the background, if the configuration asks for it.
+
+    Called by each page at import; also starts the configured list once,
+    and serves the metrics from server start on.
+    """
+    metrics.register_route()
+    if warmup == "pages":
+        _submit([event])
+    else:
+        _submit(warmup_events())
+
+
+def load(name):
+    start = time.perf_counter()
+    try:
+        data = get_event(name)
+    except Exception as e:
+        warmup_timings[name] = e
+        logger.warning("Warm-up of %s failed: %s", name, e)
+    else:
+        pool.add_map_state(name)
+        warmup_timings[name] = time.perf_counter() - start
+        logger.info(
+            "Warmed %s in %.2f s (%d footprints, %.1f MB)",
+            name,
+            warmup_timings[name],
+            len(data.footprint),
+            data.nbytes / 1024**2,
+        )
+    with _lock:
+        if len(warmup_timings) == len(_submitted):
+            logger.info(
+                "Warm-up of %d event(s) finished after %.2f s",
+                len(_submitted),
+                time.perf_counter() - _started,
+            )
+
+
+def _submit(names):
+    global _executor, _started
+    with _lock:
+        names = [name for name in names if name not in _submitted]
+        if not names:
+            return
+        if _executor is None:
+            _started = time.perf_counter()
+            _executor = ThreadPoolExecutor(
+                warmup_workers, thread_name_prefix="maxar-warmup"
+            )
+            # The event list is needed by every page too.
+            _executor.submit(get_datasets)
+        _submitted.update(names)
+        for name in names:
+            _executor.submit(load, name)
+
+
+metrics.describe(
+    "maxar_warmup_seconds", "gauge", "Seconds each event took to load at startup."
+)
+
+
+@metrics.collector
+def collect_timings():
+    for name, seconds in list(warmup_timings.items()):
+        if isinstance(seconds, float):
+            yield "maxar_warmup_seconds", {"event": name}, seconds
@@ -0,0 +1,55 @@
+import functools
+import http.server
+import json
+import threading
+from urllib.parse import urlsplit
+
+import pytest
+
+
+class StandInHandler(http.server.SimpleHTTPRequestHandler):
+    """Files of the server root, or JSON set in ``server.responses`` by path."""
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.hits.append(path)
+        if path not in self.server.responses:
+            return super().do_GET()
+        content = json.dumps(self.server.responses[path]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    """A local HTTP stand-in that records the path of every request."""
+    root = tmp_path / "www"
+    root.mkdir()
+    httpd = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(StandInHandler, directory=str(root))
+    )
+    httpd.root = root
+    httpd.hits = []
+    httpd.responses = {}
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """An empty download cache directory for the test."""
+    from solara_maxar import downloads
+
+    path = tmp_path / "cache"
+    monkeypatch.setattr(downloads, "cache_dir", str(path))
+    return path
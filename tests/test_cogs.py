@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from solara_maxar import cogs
+
+rasterio = pytest.importorskip("rasterio")
+morecantile = pytest.importorskip("morecantile")
+if cogs.Reader is None:
+    pytest.skip("rio-tiler is not installed", allow_module_level=True)
+
+zoom = 12
+
+
+@pytest.fixture
+def cog(tmp_path):
+    """A 256x256 RGB GeoTIFF of 0.1 degrees around 10.05 E, 45.05 N."""
+    path = tmp_path / "image.tif"
+    data = np.random.default_rng(0).integers(0, 255, (3, 256, 256), dtype="uint8")
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=256,
+        height=256,
+        count=3,
+        dtype="uint8",
+        crs="EPSG:4326",
+        transform=rasterio.transform.from_bounds(10, 45, 10.1, 45.1, 256, 256),
+        tiled=True,
+    ) as dst:
+        dst.write(data)
+    return str(path)
+
+
+@pytest.fixture
+def tile_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(cogs, "tile_dir", str(tmp_path / "cog-tiles"))
+    monkeypatch.setattr(cogs, "_disk_bytes", None)
+    cogs.cog_tiles.clear()
+    yield
+    cogs.cog_tiles.clear()
+
+
+def get_tile(cog, tile, renders):
+    def render():
+        renders.append(tile)
+        return cogs.render_tile(cog, tile.z, tile.x, tile.y)
+
+    return cogs.cached_tile(("Event", "A", tile.z, tile.x, tile.y), render)
+
+
+def test_tile_rendered_once_then_cached(cog, tile_caches):
+    tile = morecantile.tms.get("WebMercatorQuad").tile(10.05, 45.05, zoom)
+    renders = []
+    content = get_tile(cog, tile, renders)
+    assert content.startswith(b"\x89PNG")
+
+    assert get_tile(cog, tile, renders) == content  # from memory
+    cogs.cog_tiles.clear()
+    assert get_tile(cog, tile, renders) == content  # from disk
+    assert len(renders) == 1
+    assert cogs.tile_response(content).status_code == 200
+
+
+def test_tile_outside_bounds_is_empty(cog, tile_caches):
+    tile = morecantile.tms.get("WebMercatorQuad").tile(-100, 40, zoom)
+    renders = []
+    content = get_tile(cog, tile, renders)
+    assert content == b""
+
+    assert get_tile(cog, tile, renders) == b""
+    assert len(renders) == 1
+    assert cogs.tile_response(content).status_code == 204
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from solara_maxar import data
+from solara_maxar.cache import TTLValue
+
+
+@pytest.fixture
+def datasets(server, cache_dir, monkeypatch):
+    (server.root / "datasets.csv").write_text("dataset\nMorocco\nLibya\n")
+    monkeypatch.setattr(data, "url", server.url)
+    return server
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_one_request_for_many_gets(datasets):
+    value = TTLValue(data.read_datasets, ttl=60)
+    threads = [threading.Thread(target=value.get) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for _ in range(10):
+        assert value.get()["dataset"].tolist() == ["Morocco", "Libya"]
+    assert datasets.hits == ["/datasets.csv"]
+
+
+def test_one_background_refetch_after_ttl(datasets):
+    value = TTLValue(data.read_datasets, ttl=0.2)
+    value.get()
+    (datasets.root / "datasets.csv").write_text("dataset\nMorocco\nLibya\nMaui\n")
+    time.sleep(0.3)
+
+    # The first stale caller gets the old list at once and starts the
+    # refresh; callers meanwhile do not start another.
+    assert len(value.get()) == 2
+    for _ in range(10):
+        value.get()
+    wait_for(lambda: not value._refreshing)
+    assert datasets.hits == ["/datasets.csv", "/datasets.csv"]
+    assert value.get()["dataset"].tolist() == ["Morocco", "Libya", "Maui"]
+
+
+def test_saved_list_is_used_without_a_request(datasets):
+    data.read_datasets()
+    datasets.hits.clear()
+
+    value = TTLValue(data.read_datasets, ttl=60, fallback=data.read_saved_datasets)
+    assert value.get()["dataset"].tolist() == ["Morocco", "Libya"]
+    assert datasets.hits == []
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from solara_maxar import stac
+from solara_maxar.stac import StacPrefetcher, stac_layers
+
+
+@pytest.fixture
+def titiler(server, monkeypatch):
+    """The stand-in answering the titiler requests of resolve_stac_layer."""
+    band = {"min": 0, "max": 255, "percentile_2": 3, "percentile_98": 248}
+    server.responses.update(
+        {
+            "/stac/assets": ["visual"],
+            "/stac/statistics": {"visual": {"b1": band}},
+            "/stac/WebMercatorQuad/tilejson.json": {
+                "tiles": [f"{server.url}/tiles/{{z}}/{{x}}/{{y}}.png"]
+            },
+            "/stac/info.geojson": {"bbox": [10, 45, 10.1, 45.1]},
+        }
+    )
+    monkeypatch.delenv("MAXAR_TILE_SERVER", raising=False)  # resolve with titiler
+    monkeypatch.setattr(stac, "url", server.url)
+    monkeypatch.setattr(stac, "titiler_endpoint", server.url)
+    stac_layers.clear()
+    yield server
+    stac_layers.clear()
+
+
+def resolutions(server):
+    return server.hits.count("/stac/assets")
+
+
+def test_prefetched_layer_is_not_resolved_again(titiler):
+    prefetcher = StacPrefetcher()
+    prefetcher.prefetch("Event", ["A", "B"])
+    deadline = time.monotonic() + 5
+    while ("Event", "A") not in stac_layers or ("Event", "B") not in stac_layers:
+        assert time.monotonic() < deadline, "prefetch did not finish"
+        time.sleep(0.01)
+    assert resolutions(titiler) == 2
+
+    params = prefetcher.get("Event", "A")
+    assert params["url"] == f"{titiler.url}/datasets/Event/A.json"
+    assert params["tile_url"] == f"{titiler.url}/tiles/{{z}}/{{x}}/{{y}}.png"
+    assert params["bounds"] == [10, 45, 10.1, 45.1]
+    prefetcher.get("Event", "B")
+    assert resolutions(titiler) == 2
+
+
+def test_cached_layer_is_not_prefetched(titiler):
+    prefetcher = StacPrefetcher()
+    prefetcher.get("Event", "A")
+    prefetcher.prefetch("Event", ["A"])
+    assert prefetcher.get("Event", "A") is stac_layers.peek(("Event", "A"))
+    assert resolutions(titiler) == 1